@@ -0,0 +1,198 @@
+"""
+ASGI config for blogging project.
+
+Django 2.2 не умеет ни ASGI, ни async-views (они появились в 3.0 и
+3.1), поэтому WSGI-приложение обёрнуто в ASGI здесь. ASGI-сервер
+(uvicorn, daphne, hypercorn) держит сокеты в event loop: тело запроса
+дочитывается там же, потом Django отрабатывает в пуле потоков, а
+готовый ответ отдаётся клиенту снова из event loop. Медленный клиент
+больше не держит поток ни на загрузке запроса, ни на чтении обычного
+ответа: поток занят только пока работает view.
+
+Потоковая лента целиком читается и закрывается в том же потоке, где
+отработал view: курсор, из которого идут строки ленты, принадлежит
+соединению с базой этого потока, а закрытие ответа (request_finished)
+закрывает именно его соединения. Куски передаются в event loop через
+очередь на STREAM_BUFFER кусков; лента укладывается в неё целиком, так
+что поток не ждёт клиента.
+
+Файл (FileResponse из media или статики) в базу не ходит, поэтому его
+поток view не держит: файл читается в пуле шагами по FILE_STEP байт, и
+между шагами, пока медленный клиент принимает очередной кусок, поток
+свободен для других запросов.
+
+    uvicorn blogging.asgi:application --workers 4
+"""
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogging.settings')
+
+BODY_IN_MEMORY = 1024 * 1024
+STREAM_BUFFER = 16
+FILE_STEP = 64 * 1024
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.environ.get('ASGI_THREADS', 16)),
+            thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=BODY_IN_MEMORY)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        environ = self.environ(scope, body)
+        started = {}
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER)
+        stopped = threading.Event()
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin1'),
+                                   value.encode('latin1'))
+                                  for name, value in headers]
+
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message),
+                                             loop).result()
+
+        def run():
+            try:
+                result = self.wsgi_application(environ, start_response)
+                if getattr(result, 'file_to_stream', None) is not None:
+                    put({'file': result})
+                    return
+                try:
+                    if not getattr(result, 'streaming', False):
+                        put({'body': b''.join(result)})
+                        return
+                    for chunk in result:
+                        if stopped.is_set():
+                            return
+                        if chunk:
+                            put({'body': chunk, 'more_body': True})
+                    put({'body': b''})
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            finally:
+                put(None)
+
+        worker = loop.run_in_executor(self.executor, run)
+        message = await queue.get()
+        try:
+            if message is not None:
+                await send({'type': 'http.response.start',
+                            'status': started['status'],
+                            'headers': started['headers']})
+            while message is not None:
+                if 'file' in message:
+                    await self.send_file(message.pop('file'), send)
+                else:
+                    await send({'type': 'http.response.body', **message})
+                message = await queue.get()
+        finally:
+            # Клиент ушёл: поток дочитывает текущий кусок и закрывает
+            # ответ сам, очередь разбираем, чтобы он не ждал места в ней.
+            # Файл, который так и не начали отдавать, закрываем здесь.
+            stopped.set()
+            while message is not None:
+                if 'file' in message:
+                    await loop.run_in_executor(self.executor,
+                                               message['file'].close)
+                message = await queue.get()
+            body.close()
+        await worker
+
+    async def send_file(self, response, send):
+        loop = asyncio.get_running_loop()
+        chunks = iter(response)
+        try:
+            while True:
+                body = await loop.run_in_executor(self.executor, _read_step,
+                                                  chunks)
+                if not body:
+                    break
+                await send({'type': 'http.response.body', 'body': body,
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await loop.run_in_executor(self.executor, response.close)
+
+    def environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+            'QUERY_STRING': scope['query_string'].decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                value = f'{environ[name]},{value}'
+            environ[name] = value
+        return environ
+
+
+def _read_step(chunks):
+    """Следующие FILE_STEP байт файла (меньше -- в конце)."""
+    parts, size = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= FILE_STEP:
+            break
+    return b''.join(parts)
+
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -0,0 +1,323 @@
+"""
+Кэш, общий для всех воркеров на хосте.
+
+LocMemCache живёт внутри процесса, поэтому под gunicorn у каждого
+воркера свой холодный кэш, а инвалидация не доходит до соседей.
+SQLiteCache хранит записи в одном файле SQLite в режиме WAL: читатели
+не ждут писателей, а все процессы видят одни и те же ключи.
+
+Бэкенд выбирается переменной окружения CACHE_URL, см. cache_config().
+is_shared() говорит, видят ли все процессы одни и те же ключи: на этом
+держатся отметки «когда менялось» из posts/conditional.py.
+
+count() ведёт счётчики попаданий и промахов по именам (страницы,
+карточки): процесс копит их у себя и раз в STATS_FLUSH событий
+прибавляет к ключам в самом кэше через incr, так что при общем кэше
+счётчики общие для всех воркеров. Смотреть -- командой cache_stats.
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'blogging.cache.SQLiteCache',
+    'memcached': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+# Бэкенды, у которых кэш свой в каждом процессе.
+PROCESS_LOCAL = ('locmem',)
+LOCK_TIMEOUT = 30
+CULL_EVERY = 100
+STATS_PREFIX = 'cache_stats'
+STATS_FLUSH = 50
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+
+
+def cache_config(url, key_prefix='', version=1):
+    """
+    Превращает URL вида sqlite:///var/cache/blog.sqlite3?timeout=600
+    в словарь для settings.CACHES.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ValueError(f'Неизвестный бэкенд кэша: {parts.scheme}')
+    config = {
+        'BACKEND': BACKENDS[parts.scheme],
+        'KEY_PREFIX': key_prefix,
+        'VERSION': int(version),
+    }
+    if parts.scheme == 'memcached':
+        config['LOCATION'] = parts.netloc
+    elif parts.scheme in ('file', 'sqlite'):
+        config['LOCATION'] = parts.path
+    options = dict(parse_qsl(parts.query))
+    if 'timeout' in options:
+        config['TIMEOUT'] = int(options.pop('timeout'))
+    if options:
+        config['OPTIONS'] = {name.upper(): int(value) if value.isdigit()
+                             else value for name, value in options.items()}
+    return config
+
+
+def is_shared(url):
+    """Общий ли кэш по этому CACHE_URL для всех воркеров и run_jobs."""
+    return urlsplit(url).scheme not in PROCESS_LOCAL
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self._path, timeout=5,
+                                 isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                       'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                       'expires REAL) WITHOUT ROWID')
+            db.execute('CREATE INDEX IF NOT EXISTS cache_expires '
+                       'ON cache (expires)')
+            self._local.db = db
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _read(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()])
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        originals = {self._key(key, version): key for key in keys}
+        found = self._read(list(originals))
+        return {originals[key]: value for key, value in found.items()}
+
+    def _write(self, rows, timeout):
+        expires = self.get_backend_timeout(timeout)
+        db = self._db
+        db.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [(key, pickle.dumps(value, self.pickle_protocol), expires)
+             for key, value in rows])
+        self._cull(db)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(self._key(key, version), value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(self._key(key, version), value)
+                     for key, value in data.items()], timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?',
+                       (key, time.time()))
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, pickle.dumps(value, self.pickle_protocol),
+                 self.get_backend_timeout(timeout)))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()))
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       (pickle.dumps(value, self.pickle_protocol), key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        return bool(self._read([self._key(key, version)]))
+
+    def delete(self, key, version=None):
+        self._db.execute('DELETE FROM cache WHERE key = ?',
+                         (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        self._db.executemany('DELETE FROM cache WHERE key = ?',
+                             [(self._key(key, version),) for key in keys])
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self, db):
+        self._writes += 1
+        if self._writes % CULL_EVERY:
+            return
+        count, = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,))
+
+    def close(self, **kwargs):
+        # Соединение держим открытым между запросами, как и файловый кэш.
+        pass
+
+
+def _stats_key(name, kind):
+    return f'{STATS_PREFIX}:{name}:{kind}'
+
+
+def count(name, hits=0, misses=0):
+    """Прибавляет попадания и промахи к счётчикам name."""
+    with _pending_lock:
+        _pending[_stats_key(name, 'hits')] += hits
+        _pending[_stats_key(name, 'misses')] += misses
+        if sum(_pending.values()) < STATS_FLUSH:
+            return
+    flush_stats()
+
+
+def flush_stats():
+    """Переносит накопленные процессом счётчики в кэш."""
+    with _pending_lock:
+        pending = +_pending
+        _pending.clear()
+    for key, value in pending.items():
+        default_cache.add(key, 0, None)
+        try:
+            default_cache.incr(key, value)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            default_cache.set(key, value, None)
+
+
+def cache_stats(names):
+    """{name: {'hits': ..., 'misses': ...}} по всем процессам."""
+    keys = {name: (_stats_key(name, 'hits'), _stats_key(name, 'misses'))
+            for name in names}
+    found = default_cache.get_many([key for pair in keys.values()
+                                    for key in pair])
+    return {name: {'hits': found.get(hits, 0), 'misses': found.get(misses, 0)}
+            for name, (hits, misses) in keys.items()}
+
+
+def reset_stats(names):
+    default_cache.delete_many([_stats_key(name, kind) for name in names
+                               for kind in ('hits', 'misses')])
+
+
+def _hit(stats, value):
+    if stats:
+        count(stats, hits=1)
+    return value
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, cache=None,
+                   stats=None):
+    """
+    Защита дорогих ключей от «набега» (cache stampede).
+
+    Вместе со значением хранится время его вычисления, и незадолго до
+    истечения срока ключ с растущей вероятностью пересчитывается заранее
+    (probabilistic early expiration). Пересчитывает только тот, кто взял
+    блокировку через cache.add; остальные в это время отдают старое
+    значение или, если его нет, ждут недолго и считают сами, не трогая
+    чужую блокировку. stats -- имя счётчиков для count(): попадание --
+    ответ из кэша, промах -- вызов compute.
+    """
+    cache = cache or default_cache
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = delta * beta * -math.log(random.random() or 1e-12)
+        if time.time() + early < expires:
+            return _hit(stats, value)
+        have_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not have_lock:
+            return _hit(stats, value)
+    else:
+        have_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not have_lock:
+            for _ in range(10):
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _hit(stats, entry[0])
+    if stats:
+        count(stats, misses=1)
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+    finally:
+        if have_lock:
+            cache.delete(lock_key)
+    return value
+
@@ -0,0 +1,82 @@
+"""
+PostgreSQL с пулом соединений внутри процесса.
+
+С CONN_MAX_AGE у каждого потока своё постоянное соединение, и при
+многопоточном сервере их число растёт вместе с потоками. Здесь потоки
+берут соединения из общего на процесс ThreadedConnectionPool размером
+POOL_SIZE и возвращают их при close() вместо разрыва. Когда пул пуст,
+поток ждёт свободное соединение до POOL_TIMEOUT секунд.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg2 import extensions, pool
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POOL_TIMEOUT = 30
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, size, timeout, conn_params):
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.pool = pool.ThreadedConnectionPool(0, size, **conn_params)
+
+    def get(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise pool.PoolError('Нет свободных соединений в пуле')
+        try:
+            connection = self.pool.getconn()
+            if connection.closed:
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+        except BaseException:
+            self.slots.release()
+            raise
+        return connection
+
+    def put(self, connection):
+        try:
+            broken = connection.closed
+            if not broken and (connection.get_transaction_status()
+                               != extensions.TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+            self.pool.putconn(connection, close=bool(broken))
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def connection_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                size = self.settings_dict.get('POOL_SIZE', DEFAULT_POOL_SIZE)
+                if size < 1:
+                    raise ImproperlyConfigured('POOL_SIZE должен быть больше 0')
+                timeout = self.settings_dict.get('POOL_TIMEOUT',
+                                                 DEFAULT_POOL_TIMEOUT)
+                _pools[self.alias] = ConnectionPool(size, timeout, conn_params)
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection = self.connection_pool(conn_params).get()
+        # Как в базовом классе: уровень изоляции берётся из OPTIONS
+        # или из самого соединения.
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].put(self.connection)
@@ -0,0 +1,135 @@
+"""
+Отдача файлов из MEDIA_ROOT.
+
+django.views.static.serve читает файл целиком в Python и не умеет ни
+условных запросов, ни Range. Здесь файл отдаётся потоком FileResponse
+(wsgi.file_wrapper, то есть sendfile, если сервер его умеет), с ETag и
+Last-Modified, ответами 304 и 206. В режиме MEDIA_ACCEL передачу байтов
+забирает фронтовой прокси: nginx по X-Accel-Redirect, apache и lighttpd
+по X-Sendfile; путь в заголовке закодирован процентами, чтобы имена не
+из ASCII дошли до прокси как есть. Файлы с хэшем содержимого в имени
+(картинки постов, превью) кэшируются навсегда.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+HASHED_NAME = re.compile(r'[0-9a-f]{20}[^/]*$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+class FileRange:
+    """Файл, из которого читается только отрезок [start, start+length)."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None без Range, ValueError если мимо."""
+    match = RANGE.match(header or '')
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    try:
+        info = os.stat(fullpath)
+    except OSError:
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404('Файл не найден')
+
+    etag = f'"{info.st_size:x}-{int(info.st_mtime):x}"'
+    last_modified = int(info.st_mtime)
+    content_type = mimetypes.guess_type(fullpath)[0]
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        validators = (etag, http_date(last_modified))
+        response = _file_response(request, path, fullpath, info.st_size,
+                                  content_type, validators)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if HASHED_NAME.search(path):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=IMMUTABLE_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True,
+                            max_age=getattr(settings, 'MEDIA_MAX_AGE', 3600))
+    return response
+
+
+def _file_response(request, path, fullpath, size, content_type, validators):
+    accel = getattr(settings, 'MEDIA_ACCEL', '')
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        if accel == 'nginx':
+            prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = quote(prefix + path)
+        else:
+            response['X-Sendfile'] = quote(fullpath)
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+        return response
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(fullpath, 'rb')
+    if byte_range is None or (if_range and if_range not in validators):
+        return FileResponse(file, content_type=content_type)
+    start, end = byte_range
+    response = FileResponse(FileRange(file, start, end - start + 1),
+                            status=206, content_type=content_type)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
@@ -0,0 +1,173 @@
+"""
+Учёт SQL-запросов на каждый запрос к сайту.
+
+QueryRecorder перехватывает все запросы к базе (connection.execute_wrapper
+работает и без DEBUG) и запоминает для каждого нормализованный SQL и
+место вызова: строку шаблона, если запрос сделал тег или переменная
+шаблона, иначе ближайшую строку кода проекта. Одинаковый SQL из одного
+места N_PLUS_ONE_THRESHOLD и больше раз -- признак N+1.
+
+QueryBudgetMiddleware сверяет число запросов с QUERY_BUDGETS по имени
+URL и ищет N+1 (у потоковых ответов -- вместе с запросами, сделанными
+во время отдачи: она идёт в потоке запроса, см. blogging/asgi.py).
+
+Запись стоит обхода стека на каждый SQL-запрос, поэтому в бою
+записывается только доля QUERY_BUDGET_SAMPLE запросов к сайту, и
+нарушения в них пишутся в лог. С DEBUG записываются все запросы, а с
+QUERY_BUDGET_STRICT (его включают тестовые классы через
+override_settings) нарушение роняет запрос с QueryBudgetExceeded, так
+что тест видит ошибку.
+"""
+import logging
+import os
+import random
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+SPACES = re.compile(r'\s+')
+N_PLUS_ONE_THRESHOLD = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 3)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY_DIRS = tuple(path for path in sys.path
+                     if 'site-packages' in path or 'dist-packages' in path)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize(sql):
+    """Схлопывает списки параметров IN (%s, %s, ...) и пробелы."""
+    return SPACES.sub(' ', PLACEHOLDERS.sub('%s, ...', sql)).strip()
+
+
+def _project_file(filename):
+    return (filename.startswith(PROJECT_DIR)
+            and not filename.startswith(LIBRARY_DIRS)
+            and filename != __file__)
+
+
+def call_site():
+    """Строка шаблона или кода проекта, откуда пришёл запрос."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type(), а не isinstance: ленивые объекты вроде request.user
+        # на обращение к __class__ сами идут в базу.
+        if issubclass(type(node), Node) and getattr(node, 'token', None):
+            return f'{node.origin.template_name}:{node.token.lineno}'
+        if _project_file(frame.f_code.co_filename):
+            path = os.path.relpath(frame.f_code.co_filename, PROJECT_DIR)
+            return f'{path}:{frame.f_lineno} ({frame.f_code.co_name})'
+        frame = frame.f_back
+    return '?'
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((normalize(sql), call_site()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def groups(self):
+        """{(sql, место): сколько раз}, самые частые первыми."""
+        return dict(Counter(self.queries).most_common())
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return {key: count for key, count in self.groups().items()
+                if count >= threshold}
+
+    def problems(self, budget=None):
+        """Человекочитаемый список нарушений, пустой если всё в порядке."""
+        found = []
+        if budget is not None and len(self) > budget:
+            found.append(f'{len(self)} запросов при бюджете {budget}')
+        for (sql, site), count in self.repeated().items():
+            found.append(f'N+1: {count} раз из {site}: {sql}')
+        return found
+
+
+@contextmanager
+def record_queries(using=None):
+    """Записывает запросы ко всем базам (или к одной) внутри блока."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def assert_queries(budget=None):
+    """
+    Тестовый помощник: падает, если в блоке больше budget запросов или
+    есть N+1.
+
+        with assert_queries(4):
+            self.client.get('/')
+    """
+    with record_queries() as recorder:
+        yield recorder
+    problems = recorder.problems(budget)
+    if problems:
+        raise AssertionError('\n'.join(problems))
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.recording():
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        if response.streaming and getattr(response, 'file_to_stream',
+                                          None) is None:
+            # Потоковый ответ ходит в базу, пока его отдают: проверка --
+            # после последнего куска. Файл (FileResponse) в базу не
+            # ходит и не оборачивается, чтобы остаться файлом для
+            # wsgi.file_wrapper и ASGI-входа.
+            response.streaming_content = self._streamed(
+                request, match, recorder, response.streaming_content)
+        else:
+            self.check(request, match, recorder)
+        return response
+
+    def recording(self):
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False) or settings.DEBUG:
+            return True
+        return random.random() < getattr(settings, 'QUERY_BUDGET_SAMPLE', 0)
+
+    def _streamed(self, request, match, recorder, chunks):
+        with record_queries() as streamed:
+            yield from chunks
+        recorder.queries.extend(streamed.queries)
+        self.check(request, match, recorder)
+
+    def check(self, request, match, recorder):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        problems = recorder.problems(budgets.get(match.url_name))
+        if problems:
+            message = f'{request.method} {request.path} ({match.url_name}): '
+            message += '; '.join(problems)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
@@ -0,0 +1,98 @@
+"""
+Чтение с реплик и «читай свои записи».
+
+ReplicaRouter отправляет все записи в default, а чтения -- на случайную
+реплику из DATABASE_REPLICAS, но только внутри запроса к страницам из
+REPLICA_VIEWS (ленты, профиль, сообщество, пост). Всё остальное --
+формы, POST, команды manage.py -- читает с основной базы, чтобы не
+принимать решения по отстающим данным.
+
+Реплика отстаёт, поэтому после записи пользователь на REPLICA_PIN
+секунд «прилипает» к основной базе: ReplicaMiddleware ставит куку, и
+пока она жива, его чтения идут в default. Так автор сразу видит свой
+пост и комментарий, а остальные читатели догонят через реплику.
+
+Потоковые ленты (posts/streaming.py) читают строки уже после выхода из
+view, поэтому выбор баз переносится и на перебор ответа: на время
+каждого куска чтения снова идут туда же, куда шли во view.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+PRIMARY = 'default'
+REPLICA_VIEWS = ('index', 'follow_index', 'group', 'profile', 'post',
+                 'post_comments')
+PIN_COOKIE = 'pin_primary'
+PIN_SECONDS = 15
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'use_replicas', False) and replicas():
+            return random.choice(replicas())
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики -- копии основной базы, объекты из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in replicas()
+
+
+def _replica_view(request):
+    try:
+        return resolve(request.path_info).url_name in REPLICA_VIEWS
+    except Resolver404:
+        return False
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        _state.use_replicas = (request.method in ('GET', 'HEAD')
+                               and PIN_COOKIE not in request.COOKIES
+                               and _replica_view(request))
+        use_replicas = _state.use_replicas
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.use_replicas = _state.wrote = False
+        if response.streaming and use_replicas:
+            response.streaming_content = self._streamed(
+                response.streaming_content)
+        if wrote and replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1', httponly=True, samesite='Lax',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS',
+                                PIN_SECONDS))
+        return response
+
+    def _streamed(self, chunks):
+        chunks = iter(chunks)
+        while True:
+            _state.use_replicas = True
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _state.use_replicas = False
+            yield chunk
@@ -1,5 +1,8 @@
 import os
 
+from blogging.cache import cache_config, is_shared
+from blogging.database import database_config, replica_configs
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.environ['SECRET_KEY']
@@ -29,7 +32,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blogging.queries.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.pagecache.AnonymousPageCacheMiddleware',
+    'blogging.replicas.ReplicaMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # static for ngrok
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +46,23 @@ MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+# TEMPLATE_PROFILE=1 -- время по шаблонам и тегам, сводка в лог раз в
+# TEMPLATE_PROFILE_EVERY запросов, см. blogging/template_profile.py.
+TEMPLATE_PROFILE = os.environ.get('TEMPLATE_PROFILE', '') == '1'
+TEMPLATE_PROFILE_EVERY = int(os.environ.get('TEMPLATE_PROFILE_EVERY', 1000))
+if TEMPLATE_PROFILE:
+    MIDDLEWARE.insert(0, 'blogging.template_profile.TemplateProfileMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'blogging.template_profile': {'handlers': ['console'],
+                                      'level': 'INFO'},
+    },
+}
+
 ROOT_URLCONF = 'blogging.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -48,8 +71,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Шаблоны разбираются один раз на процесс и в DEBUG тоже:
+            # после правки шаблона перезапустите runserver.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -63,13 +93,28 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'blogging.wsgi.application'
 
+# Например postgres://blog:secret@db:5432/blog?pool=20 -- пул из 20
+# соединений на процесс. По умолчанию SQLite рядом с проектом.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_config(
+        os.environ.get('DATABASE_URL',
+                       'sqlite://' + os.path.join(BASE_DIR, 'db.sqlite3')),
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', 60)),
+    )
 }
 
+# Реплики для чтения через запятую, см. blogging/replicas.py. Локально
+# подойдёт второй файл SQLite, наполняемый командой sync_replicas.
+DATABASES.update(replica_configs(
+    [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+     if url],
+    conn_max_age=int(os.environ.get('CONN_MAX_AGE', 60)),
+))
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['blogging.replicas.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -99,10 +144,22 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
+# collectstatic пишет файлы с хэшем в имени и сжатые .br/.gz рядом,
+# WhiteNoise отдаёт их с immutable-кэшированием, см. blogging/static.py.
+STATICFILES_STORAGE = 'blogging.static.StaticStorage'
+
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# '' -- файлы отдаёт Django, 'nginx' -- X-Accel-Redirect на
+# MEDIA_ACCEL_PREFIX (internal location), 'sendfile' -- X-Sendfile.
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
 LOGIN_URL = "/auth/login/"
 
 LOGIN_REDIRECT_URL = "index"
@@ -113,12 +170,70 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Например sqlite:///var/cache/blogging/cache.sqlite3?timeout=600 --
+# один кэш на все воркеры хоста вместо отдельного LocMemCache в каждом.
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://')
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': cache_config(
+        CACHE_URL,
+        key_prefix=os.environ.get('CACHE_KEY_PREFIX', 'blogging'),
+        version=os.environ.get('CACHE_VERSION', 1),
+    )
+}
+
+# Отметки «когда менялось», на которых держатся ETag, кэш страниц и
+# лент, видны всем процессам только в общем кэше. С LocMemCache правка
+# в одном воркере не доходит до остальных, поэтому всё, что на отметках
+# держится, выключено, см. posts/conditional.py.
+CACHE_SHARED = is_shared(CACHE_URL)
+
+# Сколько SQL-запросов можно сделать странице (по имени URL), включая
+# сессию, пользователя и запросы во время потоковой отдачи. Превышение и
+# N+1 пишутся в лог, а с QUERY_BUDGET_STRICT (в тестах) роняют запрос,
+# см. blogging/queries.py. Под тестами фоновые задачи выполняются в
+# запросе (JOBS_EAGER) и тоже входят в бюджет.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group': 5,
+    'profile': 7,
+    'post': 6,
+    'post_comments': 4,
+    'follow_index': 5,
+    'search': 6,
+    'feed': 5,
+    'group_feed': 6,
+    'profile_feed': 6,
+    'new_post': 15,
+    'post_edit': 14,
+    'add_comment': 12,
+    'profile_follow': 10,
+    'profile_unfollow': 10,
 }
 
+# Какая доля запросов к сайту сверяется с бюджетом в бою: запись стоит
+# обхода стека на каждый SQL-запрос. С DEBUG сверяются все.
+QUERY_BUDGET_SAMPLE = float(os.environ.get('QUERY_BUDGET_SAMPLE', 0.01))
+
+# Раскладка по лентам, поисковый индекс и превью выполняются воркером
+# (manage.py run_jobs), см. posts/jobs.py. JOBS_EAGER=1 выполняет их
+# прямо в запросе. Воркер сообщает веб-процессам о новых постах в
+# лентах и готовых превью отметками в кэше, поэтому без общего кэша
+# задачи выполняются в запросе, а JOBS_EAGER=0 с LocMemCache не
+# запустится (posts/apps.py).
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '0' if CACHE_SHARED else '1') == '1'
+# Ошибка задачи, выполненной в запросе, роняет запрос (и тесты). 0 --
+# только писать её в лог, как делает воркер.
+JOBS_EAGER_PROPAGATE = os.environ.get('JOBS_EAGER_PROPAGATE', '1') == '1'
+
+# Кэш целых страниц для анонимных читателей, см. posts/pagecache.py.
+# Его ключ -- отметка 'posts', поэтому он включён только с общим кэшем.
+PAGE_CACHE = CACHE_SHARED
+
+# Ленты постов отдаются потоком: шапка сразу, посты по мере чтения из
+# базы, см. posts/streaming.py.
+STREAM_PAGES = True
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
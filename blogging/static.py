@@ -0,0 +1,51 @@
+"""
+Сборка статики: имена с хэшем содержимого и заранее сжатые копии.
+
+collectstatic через StaticStorage пишет каждый файл под именем с хэшем
+(bootstrap.min.3ef9a2c1.css) и манифест staticfiles.json, по которому
+{% static %} строит ссылки. Копии без хэша удаляются
+(WHITENOISE_KEEP_ONLY_HASHED_FILES), так что все ссылки ведут на файлы,
+которые WhiteNoise отдаёт с Cache-Control: immutable на год.
+
+Для каждого файла рядом кладутся .br (если установлен пакет brotli) и
+.gz на максимальном сжатии. Сжимает пул потоков: zlib и brotli отпускают
+GIL, а WhiteNoise сжимал бы файлы по одному. На запросе WhiteNoise лишь
+выбирает готовый вариант по Accept-Encoding.
+
+Без манифеста (collectstatic не запускали: тесты, свежий checkout) и в
+DEBUG ссылки строятся без хэша. Если же манифест собран, а файла в нём
+нет, {% static %} падает с ValueError: копии без хэша удалены, и
+ссылка без хэша молча вела бы на 404.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+WORKERS = getattr(settings, 'STATIC_COMPRESS_WORKERS', os.cpu_count())
+
+
+class StaticStorage(CompressedManifestStaticFilesStorage):
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.hashed_files and not settings.DEBUG:
+                raise
+            return name
+
+    def compress_files(self, names):
+        extensions = getattr(settings, 'WHITENOISE_SKIP_COMPRESS_EXTENSIONS',
+                             None)
+        compressor = self.create_compressor(extensions=extensions, quiet=True)
+        names = [name for name in names if compressor.should_compress(name)]
+
+        def compress(name):
+            return list(compressor.compress(self.path(name)))
+
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            for name, paths in zip(names, pool.map(compress, names)):
+                prefix = len(self.path(name)) - len(name)
+                for path in paths:
+                    yield name, path[prefix:]
@@ -0,0 +1,180 @@
+"""
+Профиль отрисовки шаблонов: где уходит время страницы.
+
+Пока профиль включён, каждый шаблон и каждый тег ({% include %},
+{% url %}, {% thumbnail %} ...) и переменная с фильтрами
+({{ post.text|linebreaksbr }}) замеряются, а время копится по меткам
+'template include/post_card.html', 'tag url', 'filter linebreaksbr'.
+Время включающее: у include и шаблона в него входит всё, что они
+нарисовали внутри. Переменные без фильтров не замеряются -- их много,
+а стоят они меньше самого замера.
+
+Замер ставится заменой Template._render и Node.render_annotated при
+первом включении и дальше стоит копейки, пока профиль выключен.
+TemplateProfileMiddleware (TEMPLATE_PROFILE=1) копит профиль всех
+запросов процесса и раз в TEMPLATE_PROFILE_EVERY запросов пишет сводку
+в лог; benchmark --templates печатает её по итогам замера.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.base import Node, Template, TokenType
+
+logger = logging.getLogger(__name__)
+
+# Теги-обёртки: их время -- это почти вся страница, в сводке они шум.
+SKIPPED_TAGS = ('extends', 'block')
+REPORT_ROWS = 20
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+class TemplateProfile:
+    def __init__(self):
+        self.stats = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def add(self, label, seconds):
+        with self._lock:
+            entry = self.stats[label]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def merge(self, other):
+        with self._lock:
+            for label, (count, seconds) in other.stats.items():
+                entry = self.stats[label]
+                entry[0] += count
+                entry[1] += seconds
+
+    def rows(self):
+        """[(метка, вызовов, всего мс)], самые дорогие первыми."""
+        with self._lock:
+            rows = [(label, count, seconds * 1000)
+                    for label, (count, seconds) in self.stats.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def report(self, limit=REPORT_ROWS):
+        lines = [f'{"метка":<48} {"вызовов":>8} {"всего, мс":>10} '
+                 f'{"среднее, мкс":>13}']
+        for label, count, total in self.rows()[:limit]:
+            lines.append(f'{label:<48} {count:>8} {total:>10.1f} '
+                         f'{total * 1000 / count:>13.1f}')
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.stats.clear()
+
+
+def _label(node):
+    token = getattr(node, 'token', None)
+    if token is None:
+        return None
+    if token.token_type == TokenType.BLOCK:
+        name = token.contents.split(None, 1)[0]
+        return None if name in SKIPPED_TAGS else f'tag {name}'
+    if token.token_type == TokenType.VAR:
+        filters = [func.__name__
+                   for func, args in node.filter_expression.filters]
+        return f'filter {"|".join(filters)}' if filters else None
+    return None
+
+
+def _install():
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        render_template = Template._render
+        render_node = Node.render_annotated
+
+        def profiled_template(self, context):
+            profile = getattr(_local, 'profile', None)
+            if profile is None:
+                return render_template(self, context)
+            name = self.origin.template_name or self.origin.name
+            started = time.perf_counter()
+            try:
+                return render_template(self, context)
+            finally:
+                profile.add(f'template {name}',
+                            time.perf_counter() - started)
+
+        def profiled_node(self, context):
+            profile = getattr(_local, 'profile', None)
+            label = profile and _label(self)
+            if not label:
+                return render_node(self, context)
+            started = time.perf_counter()
+            try:
+                return render_node(self, context)
+            finally:
+                profile.add(label, time.perf_counter() - started)
+
+        Template._render = profiled_template
+        Node.render_annotated = profiled_node
+        _installed = True
+
+
+@contextmanager
+def profile_templates(profile=None):
+    """
+    Замеряет шаблоны, отрисованные в этом потоке внутри блока.
+
+        with profile_templates() as profile:
+            client.get('/')
+        print(profile.report())
+    """
+    _install()
+    profile = profile or TemplateProfile()
+    previous = getattr(_local, 'profile', None)
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
+
+
+class TemplateProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.every = getattr(settings, 'TEMPLATE_PROFILE_EVERY', 1000)
+        self.total = TemplateProfile()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        profile = TemplateProfile()
+        with profile_templates(profile):
+            response = self.get_response(request)
+        if response.streaming and getattr(response, 'file_to_stream',
+                                          None) is None:
+            # Потоковая страница рисуется, пока её отдают; файлы
+            # (FileResponse) не оборачиваем.
+            response.streaming_content = self._streamed(
+                profile, response.streaming_content)
+        else:
+            self.collect(profile)
+        return response
+
+    def _streamed(self, profile, chunks):
+        with profile_templates(profile):
+            yield from chunks
+        self.collect(profile)
+
+    def collect(self, profile):
+        self.total.merge(profile)
+        with self._lock:
+            self.requests += 1
+            if self.requests % self.every:
+                return
+            requests = self.requests
+        logger.info('Шаблоны за %d запросов:\n%s', requests,
+                    self.total.report())
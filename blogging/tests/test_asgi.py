@@ -0,0 +1,173 @@
+import asyncio
+import io
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.http import FileResponse
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from blogging.asgi import WsgiToAsgi, application
+from blogging.queries import QueryBudgetMiddleware
+from posts.models import Post
+
+
+def scope(path='/', method='GET', headers=()):
+    return {'type': 'http', 'method': method, 'path': path,
+            'query_string': b'a=1', 'headers': list(headers),
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+
+
+def call(app, path='/', method='GET', body=b'', headers=()):
+    """Прогоняет один HTTP-запрос через ASGI-приложение."""
+    chunks = [{'type': 'http.request', 'body': body[:3], 'more_body': True},
+              {'type': 'http.request', 'body': body[3:]}]
+    sent = []
+
+    async def receive():
+        return chunks.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope(path, method, headers), receive, send))
+    return sent
+
+
+def echo(environ, start_response):
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [('X-Query', environ['QUERY_STRING']),
+                                   ('X-Type', environ['CONTENT_TYPE'])])
+    return [environ['PATH_INFO'].encode('latin1'), b'|', body]
+
+
+class Stream:
+    """Потоковый ответ, который запоминает, в каких потоках его читали."""
+    streaming = True
+
+    def __init__(self, threads):
+        self.threads = threads
+
+    def __iter__(self):
+        for chunk in (b'a', b'', b'b'):
+            self.threads.append(threading.get_ident())
+            yield chunk
+
+    def close(self):
+        self.threads.append(threading.get_ident())
+
+
+class WsgiToAsgiTests(SimpleTestCase):
+    def test_request_body_and_headers_reach_wsgi_app(self):
+        sent = call(WsgiToAsgi(echo, workers=1), path='/пост/', method='POST',
+                    body=b'hello', headers=[(b'content-type', b'text/plain')])
+        start, body = sent
+        self.assertEqual(start['status'], 201)
+        self.assertIn((b'x-query', b'a=1'), start['headers'])
+        self.assertIn((b'x-type', b'text/plain'), start['headers'])
+        self.assertEqual(body['body'], '/пост/|hello'.encode())
+
+    def test_stream_read_and_closed_in_view_thread(self):
+        """Поток view читает и закрывает потоковый ответ сам."""
+        threads = []
+
+        def streamed(environ, start_response):
+            threads.append(threading.get_ident())
+            start_response('200 OK', [])
+            return Stream(threads)
+
+        sent = call(WsgiToAsgi(streamed, workers=4))
+        self.assertEqual([m.get('body') for m in sent[1:]], [b'a', b'b', b''])
+        self.assertEqual(sent[-1].get('more_body', False), False)
+        self.assertEqual(len(threads), 5)
+        self.assertEqual(len(set(threads)), 1)
+
+    def test_slow_file_download_frees_thread(self):
+        """Пока клиент медленно качает файл, единственный поток свободен."""
+        content = bytes(range(256)) * 4096
+        files = []
+
+        def app(environ, start_response):
+            if environ['PATH_INFO'] != '/file':
+                return echo(environ, start_response)
+            files.append(io.BytesIO(content))
+            response = FileResponse(files[-1])
+            start_response('200 OK', list(response.items()))
+            return response
+
+        app = WsgiToAsgi(app, workers=1)
+        self.addCleanup(app.executor.shutdown)
+        received, release = [], None
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def slow_client(message):
+            received.append(message)
+            if len(received) == 2:
+                await release.wait()
+
+        async def other(message):
+            pass
+
+        async def main():
+            nonlocal release
+            release = asyncio.Event()
+            download = asyncio.ensure_future(
+                app(scope('/file'), receive, slow_client))
+            while len(received) < 2:
+                await asyncio.sleep(0.01)
+            page = scope(headers=[(b'content-type', b'text/plain')])
+            await asyncio.wait_for(app(page, receive, other), 5)
+            release.set()
+            await download
+
+        asyncio.run(main())
+        self.assertEqual(b''.join(m.get('body', b'') for m in received[1:]),
+                         content)
+        self.assertTrue(files[0].closed)
+
+    def test_django_application(self):
+        """Django отвечает через ASGI-вход так же, как через WSGI."""
+        sent = call(application, path='/about/author/')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'<html', b''.join(m.get('body', b'') for m in sent))
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+
+@override_settings(STREAM_PAGES=True, PAGE_CACHE=False,
+                   QUERY_BUDGET_STRICT=True)
+class StreamedBudgetTests(TransactionTestCase):
+    def test_streamed_queries_counted_through_asgi(self):
+        """Запросы потоковой ленты входят в бюджет и под ASGI."""
+        author = get_user_model().objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        # Свой пул: соединения его потоков закрываем сами.
+        app = WsgiToAsgi(get_wsgi_application(), workers=1)
+        self.addCleanup(app.executor.shutdown)
+        self.addCleanup(
+            lambda: app.executor.submit(connections.close_all).result())
+        with mock.patch.object(QueryBudgetMiddleware, 'check',
+                               autospec=True) as check:
+            call(app)
+        recorder = check.call_args[0][3]
+        self.assertIn('posts/paginator.py',
+                      ' '.join(site for sql, site in recorder.queries))
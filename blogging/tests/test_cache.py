@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from blogging import cache as shared
+from blogging.cache import (SQLiteCache, cache_config, cache_stats, count,
+                            flush_stats, get_or_compute, reset_stats)
+
+
+class CacheConfigTests(SimpleTestCase):
+    def test_urls(self):
+        """URL из окружения превращается в настройки кэша."""
+        config = cache_config('sqlite:///tmp/blog.sqlite3?timeout=60'
+                              '&max_entries=1000', key_prefix='b', version=3)
+        self.assertEqual(config, {
+            'BACKEND': 'blogging.cache.SQLiteCache',
+            'LOCATION': '/tmp/blog.sqlite3',
+            'KEY_PREFIX': 'b',
+            'VERSION': 3,
+            'TIMEOUT': 60,
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        })
+        self.assertEqual(cache_config('locmem://')['BACKEND'],
+                         'django.core.cache.backends.locmem.LocMemCache')
+        with self.assertRaises(ValueError):
+            cache_config('redis://localhost')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {'KEY_PREFIX': 'test'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """get/set/add/incr/delete работают как у встроенных бэкендов."""
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 1))
+        self.assertEqual(cache.incr('new', 2), 3)
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        cache.delete_many(['a', 'b'])
+        self.assertIsNone(cache.get('a'))
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('short', 1, timeout=0)
+        self.assertFalse(cache.has_key('short'))
+        self.assertTrue(cache.add('short', 2))
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр (другой воркер) видит записи первого."""
+        other = SQLiteCache(self.location, {'KEY_PREFIX': 'test'})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_versions(self):
+        """Версия ключа отделяет старые записи от новых."""
+        self.cache.set('key', 'old', version=1)
+        self.cache.incr_version('key')
+        self.assertIsNone(self.cache.get('key', version=1))
+        self.assertEqual(self.cache.get('key', version=2), 'old')
+
+    def test_cull(self):
+        """При переполнении старые записи вытесняются."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        with mock.patch.object(shared, 'CULL_EVERY', 1):
+            for i in range(30):
+                cache.set(f'key{i}', i)
+        count, = cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()
+        self.assertLessEqual(count, 11)
+
+
+@mock.patch.object(shared.random, 'random', return_value=0.5)
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache('get-or-compute', {})
+        self.cache.clear()
+
+    def test_computes_once_while_fresh(self, random):
+        """Свежее значение берётся из кэша без пересчёта."""
+        compute = mock.Mock(return_value='page')
+        for _ in range(3):
+            self.assertEqual(
+                get_or_compute('index', compute, 60, cache=self.cache), 'page')
+        compute.assert_called_once()
+
+    def test_early_recompute_near_expiry(self, random):
+        """Незадолго до истечения срока значение пересчитывается заранее."""
+        self.cache.set('index', ('old', 10.0, time.time() + 1), 60)
+        value = get_or_compute('index', lambda: 'new', 60, cache=self.cache)
+        self.assertEqual(value, 'new')
+
+    def test_single_recompute_under_lock(self, random):
+        """Пока один поток считает, остальные отдают старое значение."""
+        self.cache.set('index', ('old', 10.0, time.time() + 1), 60)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'new'
+
+        worker = threading.Thread(
+            target=get_or_compute, args=('index', slow, 60),
+            kwargs={'cache': self.cache})
+        worker.start()
+        started.wait(5)
+        compute = mock.Mock(return_value='other')
+        value = get_or_compute('index', compute, 60, cache=self.cache)
+        release.set()
+        worker.join()
+        self.assertEqual(value, 'old')
+        compute.assert_not_called()
+        self.assertEqual(self.cache.get('index')[0], 'new')
+
+    def test_waiter_keeps_owners_lock(self, random):
+        """Не дождавшийся значения считает сам, но блокировку не снимает."""
+        self.cache.add('index:lock', 1)
+        with mock.patch.object(shared.time, 'sleep'):
+            value = get_or_compute('index', lambda: 'page', 60,
+                                   cache=self.cache)
+        self.assertEqual(value, 'page')
+        self.assertIsNotNone(self.cache.get('index:lock'))
+
+
+class CacheStatsTests(SimpleTestCase):
+    def setUp(self):
+        flush_stats()
+        reset_stats(['pages', 'cards'])
+        self.addCleanup(reset_stats, ['pages', 'cards'])
+
+    def test_counters_are_flushed_to_cache(self):
+        """Счётчики копятся в процессе и переносятся в кэш пачкой."""
+        with mock.patch.object(shared, 'STATS_FLUSH', 4):
+            count('cards', hits=2, misses=1)
+            self.assertEqual(cache_stats(['cards'])['cards'],
+                             {'hits': 0, 'misses': 0})
+            count('cards', hits=1)
+        self.assertEqual(cache_stats(['cards'])['cards'],
+                         {'hits': 3, 'misses': 1})
+
+    def test_get_or_compute_counts_hits_and_misses(self):
+        cache = LocMemCache('stats', {})
+        cache.clear()
+        for _ in range(3):
+            get_or_compute('index', lambda: 'page', 60, cache=cache,
+                           stats='pages')
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertIn('pages: попаданий 2, промахов 1, доля 66.7%',
+                      out.getvalue())
+        self.assertEqual(cache_stats(['pages'])['pages'],
+                         {'hits': 0, 'misses': 0})
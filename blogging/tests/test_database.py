@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from blogging.database import check_connections, database_config
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_urls(self):
+        """URL из окружения превращается в настройки базы."""
+        self.assertEqual(database_config('sqlite:///var/blog/db.sqlite3', 60), {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': '/var/blog/db.sqlite3',
+            'CONN_MAX_AGE': 60,
+        })
+        config = database_config(
+            'postgres://blog:p%40ss@db:5432/blog?pool=20&sslmode=require')
+        self.assertEqual(config, {
+            'ENGINE': 'blogging.db.postgresql',
+            'NAME': 'blog',
+            'USER': 'blog',
+            'PASSWORD': 'p@ss',
+            'HOST': 'db',
+            'PORT': '5432',
+            'CONN_MAX_AGE': 0,
+            'POOL_SIZE': 20,
+            'OPTIONS': {'sslmode': 'require'},
+        })
+        self.assertEqual(
+            database_config('mysql://u@h/blog?conn_max_age=30')['CONN_MAX_AGE'],
+            30)
+        pooled = database_config('postgres://h/blog?pool=5&conn_max_age=30',
+                                 conn_max_age=60)
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        with self.assertRaises(ValueError):
+            database_config('oracle://h/blog')
+
+    def test_health_check_closes_broken_connections(self):
+        broken = mock.Mock(connection=object(), in_atomic_block=False,
+                           health_checked_at=0)
+        broken.is_usable.return_value = False
+        with mock.patch('django.db.connections.all', return_value=[broken]):
+            check_connections()
+            check_connections()
+        broken.close.assert_called_once_with()
+        broken.is_usable.assert_called_once_with()
+
+
+class SQLitePragmaTests(TestCase):
+    def test_connections_are_tuned(self):
+        """Новые соединения SQLite получают WAL-совместимые настройки."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -20000)
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.utils.http import http_date
+from PIL import Image
+
+from posts.models import Post
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGET_STRICT=True)
+class MediaServingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        cls.content = bytes(range(256)) * 4
+        for name in ('plain.gif', 'кот.gif'):
+            with open(os.path.join(MEDIA_ROOT, 'posts', name), 'wb') as f:
+                f.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.url = '/media/posts/plain.gif'
+
+    def test_streams_file_with_validators(self):
+        """Файл отдаётся потоком с ETag, Last-Modified и Accept-Ranges."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_get(self):
+        """Совпавший ETag или свежая дата дают 304 без тела."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """Range отдаёт 206 с нужным куском, невозможный диапазон -- 416."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.content[10:20])
+        self.assertEqual(response['Content-Range'],
+                         f'bytes 10-19/{len(self.content)}')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.content[-5:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_and_escaping_paths(self):
+        """Несуществующие файлы и выход за MEDIA_ROOT дают 404."""
+        self.assertEqual(self.client.get('/media/posts/none.gif').status_code,
+                         404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code,
+                         404)
+        self.assertEqual(self.client.get('/media/posts/').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL='nginx',
+                       MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        """В режиме nginx тело отдаёт прокси по X-Accel-Redirect."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/plain.gif')
+        self.assertEqual(response.content, b'')
+
+    def test_accel_headers_quote_non_ascii_names(self):
+        """Имя не из ASCII уходит прокси в процентной кодировке."""
+        url = '/media/posts/%D0%BA%D0%BE%D1%82.gif'
+        with override_settings(MEDIA_ACCEL='nginx'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/%D0%BA%D0%BE%D1%82.gif')
+        with override_settings(MEDIA_ACCEL='sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(
+            response['X-Sendfile'],
+            f'{MEDIA_ROOT}/posts/%D0%BA%D0%BE%D1%82.gif')
+
+    def test_hashed_upload_is_immutable(self):
+        """Картинка поста получает имя по хэшу и кэшируется навсегда."""
+        gif = BytesIO()
+        Image.new('RGB', (40, 30), 'blue').save(gif, 'GIF')
+        upload = SimpleUploadedFile('photo.gif', gif.getvalue(),
+                                    content_type='image/gif')
+        post = Post.objects.create(
+            text='Пост',
+            author=get_user_model().objects.create_user(username='DJ'),
+            image=upload)
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{20}\.gif$')
+        response = self.client.get(post.image.url)
+        self.assertIn('immutable', response['Cache-Control'])
+        plain = self.client.get(self.url)
+        self.assertNotIn('immutable', plain['Cache-Control'])
@@ -0,0 +1,78 @@
+from unittest import mock, skipIf
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from blogging.database import database_config
+
+try:
+    from psycopg2 import extensions
+
+    from blogging.db.postgresql import base
+except ImportError:
+    base = None
+
+
+@skipIf(base is None, 'нужен psycopg2')
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(base.pool, 'ThreadedConnectionPool')
+        self.backend = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.pool = base.ConnectionPool(2, 0.01, {'dbname': 'blog'})
+
+    def connection(self, closed=0, status=None):
+        connection = mock.Mock(closed=closed, isolation_level=1)
+        connection.get_transaction_status.return_value = (
+            extensions.TRANSACTION_STATUS_IDLE if status is None else status)
+        return connection
+
+    def test_waits_for_free_slot(self):
+        """Больше POOL_SIZE соединений не выдаётся, сверх -- PoolError."""
+        self.backend.getconn.side_effect = [self.connection(),
+                                            self.connection(),
+                                            self.connection()]
+        first = self.pool.get()
+        self.pool.get()
+        with self.assertRaises(base.pool.PoolError):
+            self.pool.get()
+        self.pool.put(first)
+        self.pool.get()
+        self.backend.putconn.assert_called_once_with(first, close=False)
+
+    def test_closed_connection_is_replaced(self):
+        closed, fresh = self.connection(closed=1), self.connection()
+        self.backend.getconn.side_effect = [closed, fresh]
+        self.assertIs(self.pool.get(), fresh)
+        self.backend.putconn.assert_called_once_with(closed, close=True)
+
+    def test_put_rolls_back_open_transaction(self):
+        """В пул соединение возвращается без начатой транзакции."""
+        busy = self.connection(status=extensions.TRANSACTION_STATUS_INTRANS)
+        self.backend.getconn.return_value = busy
+        self.pool.put(self.pool.get())
+        busy.rollback.assert_called_once_with()
+        self.backend.putconn.assert_called_once_with(busy, close=False)
+
+    def test_broken_connection_is_dropped(self):
+        broken = self.connection(closed=2)
+        self.pool.slots.acquire()
+        self.pool.put(broken)
+        broken.rollback.assert_not_called()
+        self.backend.putconn.assert_called_once_with(broken, close=True)
+
+    def test_close_returns_connection_to_pool(self):
+        """close() у обёртки Django отдаёт соединение в пул, не рвёт его."""
+        config = database_config('postgres://blog@db/blog?pool=2',
+                                 conn_max_age=60)
+        wrapper = ConnectionHandler({'default': config})['default']
+        self.addCleanup(base._pools.pop, 'default', None)
+        connection = self.connection()
+        self.backend.getconn.return_value = connection
+        wrapper.connection = wrapper.get_new_connection(
+            wrapper.get_connection_params())
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        self.backend.putconn.assert_called_once_with(connection, close=False)
+        connection.close.assert_not_called()
+        self.assertEqual(wrapper.settings_dict['CONN_MAX_AGE'], 0)
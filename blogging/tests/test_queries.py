@@ -0,0 +1,83 @@
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.http import FileResponse
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import override_settings
+
+from blogging.queries import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                              assert_queries, normalize, record_queries)
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(STREAM_PAGES=False, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for name in ('first', 'second', 'third'):
+            Comment.objects.create(
+                post=cls.post, text='Текст',
+                author=User.objects.create_user(username=name))
+
+    def test_normalize_collapses_parameter_lists(self):
+        self.assertEqual(normalize('SELECT 1  WHERE id IN (%s, %s,%s)'),
+                         'SELECT 1 WHERE id IN (%s, ...)')
+
+    def test_n_plus_one_is_traced_to_template_line(self):
+        """Запросы из цикла шаблона группируются по строке шаблона."""
+        template = Template('{% for item in comments %}\n'
+                            '{{ item.author.username }}\n'
+                            '{% endfor %}')
+        comments = Comment.objects.filter(post=self.post)
+        with record_queries() as recorder:
+            template.render(Context({'comments': comments}))
+        (sql, site), count = next(iter(recorder.repeated().items()))
+        self.assertEqual(count, 3)
+        self.assertTrue(site.endswith(':2'))
+        self.assertIn('auth_user', sql)
+
+    def test_assert_queries_helper(self):
+        with assert_queries(4):
+            Client().get('/')
+        with self.assertRaises(AssertionError):
+            with assert_queries(0):
+                Client().get('/')
+
+    @override_settings(QUERY_BUDGETS={'index': 0})
+    def test_budget_fails_under_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            Client().get('/')
+
+    @override_settings(QUERY_BUDGETS={'index': 0}, QUERY_BUDGET_STRICT=False,
+                       QUERY_BUDGET_SAMPLE=1)
+    def test_budget_only_warns_in_production(self):
+        with self.assertLogs('blogging.queries', 'WARNING') as logs:
+            response = Client().get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('при бюджете 0', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS={'index': 0}, QUERY_BUDGET_STRICT=False,
+                       QUERY_BUDGET_SAMPLE=0)
+    def test_unsampled_requests_not_recorded(self):
+        """Вне выборки запросы к базе не записываются вовсе."""
+        with mock.patch('blogging.queries.call_site') as call_site:
+            response = Client().get('/')
+        self.assertEqual(response.status_code, 200)
+        call_site.assert_not_called()
+
+    def test_file_response_stays_a_file(self):
+        """Файл не оборачивается: сервер отдаёт его через file_wrapper."""
+        request = RequestFactory().get('/media/posts/a.gif')
+        request.resolver_match = mock.Mock(url_name=None)
+
+        def view(request):
+            return FileResponse(BytesIO(b'gif'))
+
+        response = QueryBudgetMiddleware(view)(request)
+        self.assertIsNotNone(response.file_to_stream)
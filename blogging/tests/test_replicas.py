@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase,
+                         TransactionTestCase)
+from django.test.utils import override_settings
+
+from blogging.replicas import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def call(self, request, write=False):
+        """Прогоняет запрос через middleware, запоминая базу для чтения."""
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Post)
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return seen['read'], response
+
+    def test_feed_reads_go_to_replica(self):
+        for url in ('/', '/group/cats/', '/author/', '/author/1/'):
+            with self.subTest(url=url):
+                read, _ = self.call(self.factory.get(url))
+                self.assertEqual(read, 'replica')
+
+    def test_streamed_reads_go_to_replica(self):
+        """Строки потоковой ленты читаются после view -- тоже с реплики."""
+        def view(request):
+            return StreamingHttpResponse(
+                self.router.db_for_read(Post) for _ in range(2))
+
+        response = ReplicaMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(list(response.streaming_content),
+                         [b'replica', b'replica'])
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_forms_posts_and_commands_read_primary(self):
+        read, _ = self.call(self.factory.get('/new/'))
+        self.assertEqual(read, 'default')
+        read, _ = self.call(self.factory.post('/author/1/comment/'))
+        self.assertEqual(read, 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_writer_sticks_to_primary(self):
+        """После записи чтения пользователя идут в основную базу."""
+        _, response = self.call(self.factory.post('/author/1/comment/'),
+                                write=True)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        read, response = self.call(request)
+        self.assertEqual(read, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        read, response = self.call(self.factory.get('/'), write=True)
+        self.assertEqual(read, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(PAGE_CACHE=False, QUERY_BUDGET_SAMPLE=0)
+class ReplicaPagesTests(TransactionTestCase):
+    """Страницы на двух настоящих базах: реплика -- копия SQLite."""
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Есть на реплике', author=author)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        name = os.path.join(directory.name, 'replica.sqlite3')
+        connection.ensure_connection()
+        with sqlite3.connect(name) as replica:
+            connection.connection.backup(replica)
+        replica.close()
+        Post.objects.create(text='Только в основной', author=author)
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        self.addCleanup(connections.databases.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(lambda: connections['replica'].close())
+
+    def get(self):
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            response = Client().get('/')
+            if response.streaming:
+                return b''.join(response.streaming_content).decode()
+            return response.content.decode()
+
+    def test_streamed_page_reads_replica(self):
+        for stream in (True, False):
+            with self.subTest(stream=stream), \
+                    override_settings(STREAM_PAGES=stream):
+                page = self.get()
+                self.assertIn('Есть на реплике', page)
+                self.assertNotIn('Только в основной', page)
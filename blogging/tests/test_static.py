@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+
+STATIC_ROOT = tempfile.mkdtemp()
+CSS = 'posts/critical.css'
+
+try:
+    import brotli  # noqa: F401
+except ImportError:
+    brotli = None
+
+
+@override_settings(STATIC_ROOT=STATIC_ROOT)
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(STATIC_ROOT=STATIC_ROOT):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_hashed_and_compressed(self):
+        """Собираются только файлы с хэшем, рядом лежат сжатые копии."""
+        url = static(CSS)
+        self.assertRegex(url, r'^/static/posts/critical\.[0-9a-f]{12}\.css$')
+        path = os.path.join(STATIC_ROOT, url[len('/static/'):])
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(path + '.gz'))
+        self.assertEqual(os.path.exists(path + '.br'), brotli is not None)
+        self.assertFalse(os.path.exists(os.path.join(STATIC_ROOT, CSS)))
+
+    def test_served_immutable_and_precompressed(self):
+        """WhiteNoise отдаёт готовую сжатую копию с вечным кэшем."""
+        response = Client().get(static(CSS), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_missing_manifest_entry_fails_loudly(self):
+        """С собранным манифестом файл не из него -- ошибка, а не 404."""
+        with self.assertRaises(ValueError):
+            static('posts/missing.css')
+        with self.settings(DEBUG=True):
+            self.assertEqual(static('posts/missing.css'),
+                             '/static/posts/missing.css')
+
+    def test_critical_css_inlined(self):
+        html = Template(
+            "{% load assets %}{% inline_static 'posts/critical.css' %}"
+        ).render(Context())
+        self.assertTrue(html.startswith('<style>'))
+        self.assertIn('.navbar', html)
+
+
+@override_settings(STREAM_PAGES=False, QUERY_BUDGET_STRICT=True)
+class WithoutManifestTests(TestCase):
+    def test_pages_render_without_collectstatic(self):
+        """Без собранной статики ссылки строятся без хэша."""
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/bootstrap/dist/css/'
+                                      'bootstrap.min.css')
+        self.assertContains(response, '<style>')
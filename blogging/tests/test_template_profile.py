@@ -0,0 +1,64 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blogging.template_profile import (TemplateProfileMiddleware,
+                                       profile_templates)
+from posts.models import Post
+
+
+@override_settings(STREAM_PAGES=False, QUERY_BUDGET_STRICT=True)
+class TemplateProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='author')
+        Post.objects.create(text='Пост\nв две строки', author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_templates_tags_and_filters(self):
+        """Время копится по шаблонам, тегам и фильтрам."""
+        with profile_templates() as profile:
+            self.client.get(reverse('index'))
+        stats = {label: count for label, count, total in profile.rows()}
+        self.assertEqual(stats['template index.html'], 1)
+        self.assertEqual(stats['template include/post_card.html'], 1)
+        self.assertGreaterEqual(stats['tag include'], 3)
+        self.assertEqual(stats['tag cached_url'], 2)
+        self.assertEqual(stats['filter linebreaksbr'], 1)
+        self.assertNotIn('tag block', stats)
+        self.assertIn('template index.html', profile.report())
+
+    def test_nothing_recorded_outside(self):
+        with profile_templates() as profile:
+            pass
+        self.client.get(reverse('index'))
+        self.assertEqual(profile.rows(), [])
+
+    @override_settings(TEMPLATE_PROFILE_EVERY=2)
+    def test_middleware_logs_summary(self):
+        """Middleware пишет сводку в лог раз в TEMPLATE_PROFILE_EVERY."""
+        middleware = TemplateProfileMiddleware(
+            lambda request: HttpResponse(render_to_string('misc/404.html')))
+        request = RequestFactory().get('/')
+        middleware(request)
+        with self.assertLogs('blogging.template_profile',
+                             logging.INFO) as logs:
+            middleware(request)
+        self.assertIn('template misc/404.html', logs.output[0])
+
+    def test_cached_loader(self):
+        """Шаблон разбирается один раз на процесс."""
+        engine = engines['django'].engine
+        self.assertIsInstance(engine.template_loaders[0], CachedLoader)
+        self.assertIs(engine.get_template('index.html'),
+                      engine.get_template('index.html'))
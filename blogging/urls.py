@@ -2,9 +2,8 @@ from django.contrib import admin
 from django.urls import include, path, re_path  # re_path for ngrok
 from django.conf.urls import handler404, handler500
 from django.conf import settings
-from django.conf.urls.static import static
-from django.contrib.staticfiles.urls import staticfiles_urlpatterns  # for ngrok
-from django.views.static import serve  # for ngrok
+
+from blogging.media import serve_media
 
 
 handler404 = "posts.views.page_not_found" # noqa
@@ -22,12 +21,6 @@ urlpatterns = [
 if settings.DEBUG:
     import debug_toolbar
 
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL,
-                          document_root=settings.STATIC_ROOT)
     urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)
 
-urlpatterns += staticfiles_urlpatterns()  # for ngrok
-urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve,
-                {'document_root': settings.MEDIA_ROOT, }), ]  # for ngrok
+urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve_media), ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Job, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -29,7 +29,14 @@ class FollowAdmin(admin.ModelAdmin):
     list_filter = ('user', )
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('key', 'status', 'attempts', 'run_at')
+    search_fields = ('key',)
+    list_filter = ('status', 'name')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Job, JobAdmin)
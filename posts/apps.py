@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        if not settings.JOBS_EAGER and not settings.CACHE_SHARED:
+            raise ImproperlyConfigured(
+                'JOBS_EAGER=0 требует общего кэша: отметки, которые '
+                'двигает run_jobs, не дойдут до LocMemCache веб-процессов. '
+                'Задайте CACHE_URL (sqlite://, file://, memcached://).')
+        from . import signals, tasks  # noqa
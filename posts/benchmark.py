@@ -0,0 +1,256 @@
+"""
+Замеры горячих страниц блога.
+
+Каждая страница запрашивается тестовым клиентом Django прямо в
+процессе, без сети: так в цифры попадают только view, ORM и шаблоны.
+Для каждой страницы считаются перцентили задержки и времени до первого
+куска ответа (TTFB), число SQL-запросов (максимум по прогону; перед
+каждой страницей кэш очищается) и пик памяти, выделенной за запрос
+(tracemalloc). Ленты из STREAMED_ENDPOINTS меряются дважды -- обычным
+render() и потоком (posts/streaming.py), без кэша страниц, чтобы
+сравнивались сами отрисовки. Результаты -- список словарей,
+который удобно сохранить в JSON и сравнить с прошлым прогоном через
+compare().
+
+connection_capacity() меряет другое -- сколько медленных клиентов
+выдерживает уже запущенный сервер: WSGI (gunicorn) против ASGI
+(uvicorn с blogging.asgi).
+"""
+import asyncio
+import random
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User
+
+ENDPOINTS = ('index', 'group_posts', 'profile', 'post_view', 'follow_index',
+             'add_comment')
+STREAMED_ENDPOINTS = ('index', 'group_posts', 'profile', 'follow_index')
+PERCENTILES = (50, 90, 95, 99)
+MEMORY_SAMPLES = 5
+
+
+def percentile(values, rank):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return values[index]
+
+
+class Sampler:
+    """Случайные посты, сообщества и читатели для запросов."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        self.group_slugs = list(Group.objects.values_list('slug', flat=True))
+        self.readers = list(Follow.objects.order_by()
+                            .values_list('user', flat=True).distinct())
+
+    def post(self):
+        pk = self.rng.choice(self.post_ids)
+        return Post.objects.select_related('author').only(
+            'author__username').get(pk=pk)
+
+    def group_url(self):
+        return reverse('group', args=[self.rng.choice(self.group_slugs)])
+
+    def reader(self):
+        return self.rng.choice(self.readers)
+
+
+def _requests(endpoint, sampler, client):
+    """Бесконечный поток (метод, url, данные) для страницы."""
+    while True:
+        if endpoint == 'index':
+            yield 'get', reverse('index'), None
+        elif endpoint == 'group_posts':
+            yield 'get', sampler.group_url(), None
+        elif endpoint == 'profile':
+            yield 'get', reverse('profile', args=[
+                sampler.post().author.username]), None
+        elif endpoint == 'post_view':
+            post = sampler.post()
+            yield 'get', reverse('post', args=[post.author.username,
+                                               post.id]), None
+        elif endpoint == 'follow_index':
+            client.force_login(User.objects.get(pk=sampler.reader()))
+            yield 'get', reverse('follow_index'), None
+        elif endpoint == 'add_comment':
+            post = sampler.post()
+            client.force_login(User.objects.get(pk=sampler.reader()))
+            yield 'post', reverse('add_comment', args=[
+                post.author.username, post.id]), {'text': 'Замер'}
+
+
+def _consume(response, started):
+    """Дочитывает ответ, возвращает время до первого куска."""
+    if not response.streaming:
+        return time.perf_counter() - started
+    first = None
+    for _ in response.streaming_content:
+        if first is None:
+            first = time.perf_counter() - started
+    return first if first is not None else time.perf_counter() - started
+
+
+def measure(endpoint, requests=50, warmup=5, seed=0, streaming=None):
+    """
+    Замеряет одну страницу, возвращает словарь с результатами.
+    streaming=True или False включает или выключает STREAM_PAGES на
+    время замера (и отключает кэш страниц), None -- настройки как есть.
+    """
+    if streaming is not None:
+        with override_settings(STREAM_PAGES=streaming, PAGE_CACHE=False):
+            result = measure(endpoint, requests, warmup, seed)
+        result['streaming'] = streaming
+        return result
+
+    rng = random.Random(seed)
+    sampler = Sampler(rng)
+    client = Client()
+    stream = _requests(endpoint, sampler, client)
+    cache.clear()
+
+    def call():
+        method, url, data = next(stream)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            first = _consume(response, started)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{endpoint}: {url} -> {response.status_code}')
+        return elapsed, first, len(queries)
+
+    for _ in range(warmup):
+        call()
+    timings, firsts, counts = zip(*(call() for _ in range(requests)))
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'endpoint': endpoint,
+        'requests': requests,
+        'queries': max(counts),
+        'queries_median': percentile(counts, 50),
+        'memory_peak_kib': round(max(peaks) / 1024, 1),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+    }
+    for rank in PERCENTILES:
+        result[f'p{rank}_ms'] = round(percentile(timings, rank) * 1000, 2)
+    for rank in (50, 99):
+        result[f'ttfb_p{rank}_ms'] = round(percentile(firsts, rank) * 1000,
+                                           2)
+    return result
+
+
+def run(endpoints=ENDPOINTS, **options):
+    posts = Post.objects.count()
+    results = []
+    for endpoint in endpoints:
+        modes = (False, True) if endpoint in STREAMED_ENDPOINTS else (None,)
+        for streaming in modes:
+            results.append({'posts': posts, **measure(
+                endpoint, streaming=streaming, **options)})
+    return results
+
+
+def compare(results, baseline, tolerance=0):
+    """
+    Сравнивает число запросов с прошлым прогоном. Возвращает список
+    строк с регрессиями: страница стала делать больше запросов, чем
+    в baseline плюс tolerance.
+    """
+    def key(row):
+        return row['posts'], row['endpoint'], row.get('streaming')
+
+    previous = {key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(key(row))
+        if old is not None and row['queries'] > old['queries'] + tolerance:
+            regressions.append(
+                f"{row['endpoint']} при {row['posts']} постов: "
+                f"{old['queries']} -> {row['queries']} запросов")
+    return regressions
+
+
+async def _slow_client(host, port, request, hold):
+    """Шлёт запрос по половинке с паузой hold, как клиент на плохой связи."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return False
+    try:
+        half = len(request) // 2
+        writer.write(request[:half])
+        await writer.drain()
+        await asyncio.sleep(hold)
+        writer.write(request[half:])
+        await writer.drain()
+        await reader.read()
+        return True
+    except OSError:
+        return False
+    finally:
+        writer.close()
+
+
+async def _probe(host, port, request, timeout):
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout)
+        writer.write(request)
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    if not status.startswith(b'HTTP/'):
+        return None
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def _capacity(url, levels, hold, timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    request = (f'GET {parts.path or "/"} HTTP/1.1\r\nHost: {parts.netloc}'
+               f'\r\nConnection: close\r\n\r\n').encode()
+    results = []
+    for level in levels:
+        clients = [asyncio.ensure_future(_slow_client(host, port, request,
+                                                      hold))
+                   for _ in range(level)]
+        await asyncio.sleep(min(hold / 2, 1))
+        probe_ms = await _probe(host, port, request, timeout)
+        served = sum(await asyncio.gather(*clients))
+        results.append({'connections': level, 'served': served,
+                        'probe_ms': probe_ms})
+    return results
+
+
+def connection_capacity(url, levels=(10, 50, 100, 250, 500, 1000), hold=5.0,
+                        timeout=2.0):
+    """
+    Держит открытыми level медленных соединений и в это время шлёт
+    обычный запрос. probe_ms=None значит, что сервер не ответил за
+    timeout: все его воркеры заняты медленными клиентами.
+    """
+    return asyncio.run(_capacity(url, levels, hold, timeout))
@@ -0,0 +1,48 @@
+"""
+Кэш отрисованных карточек постов.
+
+Ключ карточки содержит id поста, время его изменения и число
+комментариев, поэтому правка поста или новый комментарий просто дают
+новый ключ, а старая карточка доживает свой срок в кэше. Карточка не
+зависит от зрителя и общая для всех лент; кнопка «Редактировать»
+рисуется вне неё, в include/post_item.html.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from blogging.cache import count
+
+CARD_TEMPLATE = 'include/post_card.html'
+CARD_TIMEOUT = getattr(settings, 'POST_CARD_TIMEOUT', 60 * 60 * 24)
+
+
+def card_key(post):
+    return (f'post_card:{post.id}:{post.updated.timestamp()}:'
+            f'{post.comment_count}')
+
+
+def attach_cards(posts, request=None):
+    """
+    Кладёт в post.card готовую разметку; один get_many на страницу.
+    request нужен только ссылкам карточки ({% cached_url %} запоминает
+    их на время запроса), от зрителя карточка не зависит.
+    """
+    keys = {card_key(post): post for post in posts}
+    cached = cache.get_many(keys)
+    count('cards', hits=len(cached), misses=len(keys) - len(cached))
+    rendered = {}
+    for key, post in keys.items():
+        card = cached.get(key)
+        if card is None:
+            card = rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'request': request})
+        post.card = mark_safe(card)
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return posts
+
+
+def forget_card(post):
+    cache.delete(card_key(post))
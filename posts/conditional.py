@@ -0,0 +1,187 @@
+"""
+Условные GET для лент и страницы поста.
+
+Валидаторы (ETag и Last-Modified) считаются без отрисовки шаблона: из
+даты последнего поста ленты, строки поста с максимальной датой его
+комментариев и отметок «когда менялось» в кэше. Отметку 'posts' двигает
+любая правка постов, комментариев, сообществ и подписок (от последних
+зависят счётчики в карточке автора), отметку 'user:<id>' -- посты
+пользователя и подписки, где он подписчик или автор (это и есть версия
+набора подписок). Пропавшая из кэша отметка считается только
+что изменённой: страницы один раз перекачаются, но устаревшими не
+останутся.
+
+Отметки работают, только если кэш общий для всех процессов
+(CACHE_SHARED): с LocMemCache у каждого воркера свои отметки, правка в
+одном не сдвигает их в остальных, и те отвечали бы 304 на устаревшую
+страницу. Поэтому без общего кэша условные GET выключены, а кэши,
+ключ которых содержит отметку (ленты, страницы, подписки), не
+используются -- см. stamps_shared(). Ленты для агрегаторов --
+исключение: их валидаторы тогда считаются только из базы, по id и
+датам последних FEED_ITEMS постов ленты (feed_validators).
+
+Анонимные ответы помечаются public, ответы залогиненным -- private, и
+все с Vary: Cookie, чтобы прокси не отдал одним чужую страницу.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .models import Post, User
+
+CHANGED_PREFIX = 'changed:'
+FEED_ITEMS = getattr(settings, 'FEED_ITEMS', 30)
+
+
+def stamps_shared():
+    """Видят ли все процессы одни и те же отметки."""
+    return getattr(settings, 'CACHE_SHARED', True)
+
+
+def touch(*scopes):
+    now = time.time()
+    cache.set_many({CHANGED_PREFIX + scope: now for scope in scopes}, None)
+
+
+def changed_at(*scopes):
+    """Самая поздняя отметка из scopes, одним обращением к кэшу."""
+    keys = [CHANGED_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        cache.set_many({key: now for key in missing}, None)
+        found.update(dict.fromkeys(missing, now))
+    return max(found.values())
+
+
+def _viewer(request):
+    return request.user.pk if request.user.is_authenticated else 'anon'
+
+
+def _user_scopes(request, *user_ids):
+    if request.user.is_authenticated:
+        user_ids += (request.user.pk,)
+    return [f'user:{pk}' for pk in user_ids]
+
+
+def _latest(posts):
+    latest = posts.order_by('-pub_date').values_list('pub_date',
+                                                     flat=True).first()
+    return latest.timestamp() if latest else 0.0
+
+
+def _validators(request, *parts):
+    """ETag из всех частей, Last-Modified -- самая поздняя из дат."""
+    digest = hashlib.md5(
+        repr((request.get_full_path(), _viewer(request)) + parts).encode())
+    moments = [part for part in parts if isinstance(part, float)]
+    return quote_etag(digest.hexdigest()), int(max(moments))
+
+
+def index_validators(request):
+    return _validators(request, _latest(Post.objects), changed_at('posts'))
+
+
+def group_validators(request, slug):
+    return _validators(request, _latest(Post.objects.filter(group__slug=slug)),
+                       changed_at('posts'))
+
+
+def profile_validators(request, username):
+    row = (User.objects.filter(username=username)
+           .annotate(latest=Max('posts__pub_date'))
+           .values_list('pk', 'latest').first())
+    if row is None:
+        return None
+    author_id, latest = row
+    return _validators(request, latest.timestamp() if latest else 0.0,
+                       changed_at('posts', *_user_scopes(request, author_id)))
+
+
+def post_validators(request, username, post_id):
+    row = (Post.objects.filter(id=post_id, author__username=username)
+           .order_by().annotate(last_comment=Max('comments__created'))
+           .values_list('updated', 'comment_count', 'author_id',
+                        'last_comment')
+           .first())
+    if row is None:
+        return None
+    updated, comment_count, author_id, last_comment = row
+    return _validators(request, comment_count, updated.timestamp(),
+                       last_comment.timestamp() if last_comment else 0.0,
+                       changed_at(*_user_scopes(request, author_id)))
+
+
+def follow_validators(request):
+    return _validators(request, changed_at('posts', *_user_scopes(request)))
+
+
+def _feed_rows(request, posts):
+    rows = list(posts.order_by('-pub_date', '-id')
+                .values_list('id', 'pub_date', 'updated')[:FEED_ITEMS])
+    moments = [moment.timestamp() for _, pub_date, updated in rows
+               for moment in (pub_date, updated)]
+    return _validators(request, tuple(pk for pk, _, _ in rows),
+                       max(moments, default=0.0))
+
+
+def feed_validators(request, fmt, **kwargs):
+    """
+    Для лент: те же валидаторы, что у страницы, которую они повторяют.
+    Без общего кэша -- из самих постов ленты, одним запросом.
+    """
+    if not stamps_shared():
+        posts = Post.objects.all()
+        if 'slug' in kwargs:
+            posts = posts.filter(group__slug=kwargs['slug'])
+        elif 'username' in kwargs:
+            posts = posts.filter(author__username=kwargs['username'])
+        return _feed_rows(request, posts)
+    if 'slug' in kwargs:
+        return group_validators(request, kwargs['slug'])
+    if 'username' in kwargs:
+        return profile_validators(request, kwargs['username'])
+    return index_validators(request)
+
+
+def conditional(validators, needs_stamps=True):
+    """
+    Отвечает 304, если валидаторы из validators(request, ...) совпали
+    с присланными, иначе вызывает view и ставит их в ответ.
+    validators может вернуть None -- тогда view работает как обычно.
+    needs_stamps=False -- validators обходятся без отметок в кэше и
+    работают и без общего кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or needs_stamps and not stamps_shared()):
+                return view(request, *args, **kwargs)
+            found = validators(request, *args, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = found
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, public=True, max_age=0)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,69 @@
+"""
+Денормализованные счётчики: комментарии поста, посты, подписчики и
+подписки пользователя. Меняются атомарно через F() из сигналов, а
+rebuild() пересчитывает их с нуля, если они разошлись с данными.
+"""
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+def bump_user(user_id, field, delta):
+    counters = UserCounters.objects.filter(user=user_id)
+    if delta < 0:
+        counters.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta})
+    elif not counters.update(**{field: F(field) + delta}):
+        rebuild_users(User.objects.filter(pk=user_id))
+
+
+def bump_post(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def count_new_posts(posts):
+    for author_id, count in Counter(post.author_id for post in posts).items():
+        bump_user(author_id, 'post_count', count)
+
+
+def user_counters(user):
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        rebuild_users(User.objects.filter(pk=user.pk))
+        return UserCounters.objects.get(user=user)
+
+
+def _count(queryset, field):
+    counts = (queryset.filter(**{field: OuterRef('pk')})
+              .order_by().values(field).annotate(total=Count('pk'))
+              .values('total'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def rebuild_users(users=None):
+    users = User.objects.all() if users is None else users
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in users.values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    return UserCounters.objects.filter(user__in=users.values('pk')).update(
+        post_count=_count(Post.objects, 'author'),
+        follower_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
+
+
+def rebuild_posts(posts=None):
+    posts = Post.objects.all() if posts is None else posts
+    return posts.update(comment_count=_count(Comment.objects, 'post'))
+
+
+def rebuild():
+    return rebuild_users(), rebuild_posts()
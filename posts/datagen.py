@@ -0,0 +1,188 @@
+"""
+Генератор данных для нагрузочных замеров.
+
+Создаёт пользователей, сообщества, посты, комментарии и подписки в
+соотношениях, похожих на живой блог: на тысячу постов приходится
+RATIOS['users'] авторов, популярность авторов распределена по Ципфу
+(несколько звёзд и длинный хвост), а комментируют в основном свежие
+посты. Всё пишется через bulk_create, сигналы не срабатывают, поэтому
+в конце счётчики, ленты и (по желанию) поисковый индекс
+пересчитываются целиком.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+RATIOS = {
+    'users': 50,        # на 1000 постов
+    'groups': 0.5,      # на 1000 постов
+    'comments': 1500,   # на 1000 постов
+    'follows': 15,      # в среднем подписок у пользователя
+    'no_group': 0.3,    # доля постов вне сообществ
+}
+BATCH_SIZE = 5000
+PERIOD = timedelta(days=365)
+PASSWORD = 'benchmark'
+WORDS = (
+    'блог пост лента автор сообщество подписка комментарий текст день '
+    'город море книга музыка фильм кофе утро вечер работа отпуск кот '
+    'собака погода новости идея проект код релиз ошибка тест запрос '
+    'страница кэш база индекс сервер память время скорость быстро '
+    'медленно хорошо плохо сегодня вчера завтра опять снова наконец'
+).split()
+
+
+@contextmanager
+def manual_dates():
+    """Даёт задать pub_date и created руками, отключая auto_now*."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('updated'),
+              Comment._meta.get_field('created')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _zipf_weights(size):
+    return list(accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def _new_ids(model, start):
+    # SQLite не возвращает pk из bulk_create, поэтому дочитываем их.
+    return list(model.objects.filter(pk__gt=start).order_by('pk')
+                .values_list('pk', flat=True))
+
+
+def _last_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return last or 0
+
+
+def _batches(objects, size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def create_users(count, rng):
+    start = _last_pk(User)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (User(username=f'bench{start + i}', password=password,
+              first_name=rng.choice(WORDS).capitalize())
+         for i in range(1, count + 1)))
+    return _new_ids(User, start)
+
+
+def create_groups(count, rng):
+    start = _last_pk(Group)
+    Group.objects.bulk_create(
+        Group(title=f'Сообщество {start + i}', slug=f'bench-{start + i}',
+              description=_text(rng, 5, 30))
+        for i in range(1, count + 1))
+    return _new_ids(Group, start)
+
+
+def create_posts(count, authors, groups, rng, batch_size=BATCH_SIZE):
+    start = _last_pk(Post)
+    weights = _zipf_weights(len(authors))
+    now = timezone.now()
+    dates = sorted(now - PERIOD * rng.random() for _ in range(count))
+    posts = (
+        Post(text=_text(rng, 5, 120), pub_date=date, updated=date,
+             author_id=rng.choices(authors, cum_weights=weights)[0],
+             group_id=(None if not groups or rng.random() < RATIOS['no_group']
+                       else rng.choice(groups)))
+        for date in dates
+    )
+    for batch in _batches(posts, batch_size):
+        Post.objects.bulk_create(batch, count=False)
+    return _new_ids(Post, start)
+
+
+def create_comments(count, posts, users, rng, batch_size=BATCH_SIZE):
+    now = timezone.now()
+    last = len(posts) - 1
+    # Свежие посты (в конце списка) комментируют чаще старых.
+    comments = (
+        Comment(post_id=posts[min(int(len(posts) * rng.random() ** 0.3),
+                                  last)],
+                author_id=rng.choice(users), text=_text(rng, 2, 40),
+                created=now - PERIOD * rng.random())
+        for _ in range(count)
+    )
+    for batch in _batches(comments, batch_size):
+        Comment.objects.bulk_create(batch)
+
+
+def create_follows(users, authors, rng, batch_size=BATCH_SIZE):
+    if len(authors) < 2:
+        return
+    weights = _zipf_weights(len(authors))
+    follows = (
+        Follow(user_id=user, author_id=author)
+        for user in users
+        for author in set(rng.choices(
+            authors, cum_weights=weights,
+            k=min(rng.randint(0, 2 * RATIOS['follows']), len(authors))))
+        if author != user
+    )
+    for batch in _batches(follows, batch_size):
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def generate(posts, seed=0, index=False, log=None):
+    """
+    Добавляет posts постов и пропорциональное число остальных объектов.
+    Возвращает, сколько чего добавлено.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    users = max(2, posts * RATIOS['users'] // 1000)
+    groups = max(1, round(posts * RATIOS['groups'] / 1000))
+    comments = posts * RATIOS['comments'] // 1000
+
+    with transaction.atomic(), manual_dates():
+        log(f'Пользователи: {users}')
+        new_users = create_users(users, rng)
+        log(f'Сообщества: {groups}')
+        create_groups(groups, rng)
+        all_users = list(User.objects.values_list('pk', flat=True))
+        all_groups = list(Group.objects.values_list('pk', flat=True))
+        log(f'Посты: {posts}')
+        rng.shuffle(all_users)
+        new_posts = create_posts(posts, all_users, all_groups, rng)
+        log(f'Комментарии: {comments}')
+        create_comments(comments, new_posts, all_users, rng)
+        log('Подписки')
+        create_follows(new_users, all_users, rng)
+        log('Счётчики и ленты')
+        counters.rebuild()
+        timeline.rebuild()
+    if index:
+        log('Поисковый индекс')
+        search.reindex()
+    return {'users': len(new_users), 'groups': groups, 'posts': posts,
+            'comments': comments}
@@ -0,0 +1,200 @@
+"""
+Ленты Atom, RSS и JSON Feed для сайта, сообщества и автора.
+
+django.contrib.syndication собирает документ целиком в памяти, а здесь
+он пишется потоком: заголовок уходит клиенту раньше, чем прочитан
+первый пост, а дальше посты идут по одному прямо из iterator(). Пока
+ответ уходит, его куски копятся, и готовый документ кладётся в кэш под
+ключом с отметкой 'posts' из conditional.py -- новый пост меняет
+отметку, и все ленты пересобираются при следующем запросе. Без общего
+кэша (CACHE_SHARED) ленты не кэшируются: отметку в соседнем воркере
+новый пост не сдвинет. ETag и Last-Modified ставит тот же декоратор
+conditional, что и у страниц; без общего кэша он считает их из базы.
+"""
+import hashlib
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import get_tag_uri, rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from .conditional import FEED_ITEMS, changed_at, stamps_shared
+
+FORMATS = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+ITEMS = FEED_ITEMS
+TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60)
+TITLE_WORDS = 10
+
+
+class FeedFormatConverter:
+    regex = '|'.join(FORMATS)
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+def _text(value):
+    return escape(str(value))
+
+
+def _author(post):
+    return post.author.get_full_name() or post.author.username
+
+
+def _entry(request, post):
+    link = request.build_absolute_uri(
+        reverse('post', args=[post.author.username, post.id]))
+    return {
+        'id': get_tag_uri(link, post.pub_date),
+        'link': link,
+        'title': Truncator(post.text).words(TITLE_WORDS),
+        'html': linebreaksbr(post.text),
+        'author': _author(post),
+        'group': post.group.title if post.group_id else None,
+        'published': post.pub_date,
+        'updated': post.updated,
+    }
+
+
+def atom(feed, entries):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<feed xmlns="http://www.w3.org/2005/Atom">'
+           f'<title>{_text(feed["title"])}</title>'
+           f'<link href={quoteattr(feed["link"])} rel="alternate"/>'
+           f'<link href={quoteattr(feed["url"])} rel="self"/>'
+           f'<id>{_text(feed["link"])}</id>'
+           f'<updated>{rfc3339_date(feed["updated"])}</updated>')
+    for entry in entries:
+        category = (f'<category term={quoteattr(entry["group"])}/>'
+                    if entry['group'] else '')
+        yield ('<entry>'
+               f'<title>{_text(entry["title"])}</title>'
+               f'<link href={quoteattr(entry["link"])} rel="alternate"/>'
+               f'<id>{_text(entry["id"])}</id>'
+               f'<published>{rfc3339_date(entry["published"])}</published>'
+               f'<updated>{rfc3339_date(entry["updated"])}</updated>'
+               f'<author><name>{_text(entry["author"])}</name></author>'
+               f'{category}'
+               f'<content type="html">{_text(entry["html"])}</content>'
+               '</entry>')
+    yield '</feed>\n'
+
+
+def rss(feed, entries):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"'
+           ' xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+           f'<title>{_text(feed["title"])}</title>'
+           f'<link>{_text(feed["link"])}</link>'
+           f'<description>{_text(feed["description"])}</description>'
+           f'<atom:link href={quoteattr(feed["url"])} rel="self"/>'
+           f'<lastBuildDate>{rfc2822_date(feed["updated"])}</lastBuildDate>')
+    for entry in entries:
+        category = (f'<category>{_text(entry["group"])}</category>'
+                    if entry['group'] else '')
+        yield ('<item>'
+               f'<title>{_text(entry["title"])}</title>'
+               f'<link>{_text(entry["link"])}</link>'
+               f'<description>{_text(entry["html"])}</description>'
+               f'<dc:creator>{_text(entry["author"])}</dc:creator>'
+               f'<pubDate>{rfc2822_date(entry["published"])}</pubDate>'
+               f'<guid isPermaLink="false">{_text(entry["id"])}</guid>'
+               f'{category}'
+               '</item>')
+    yield '</channel></rss>\n'
+
+
+def json_feed(feed, entries):
+    header = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'home_page_url': feed['link'],
+        'feed_url': feed['url'],
+        'description': feed['description'],
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    separator = ''
+    for entry in entries:
+        item = {
+            'id': entry['id'],
+            'url': entry['link'],
+            'title': entry['title'],
+            'content_html': entry['html'],
+            'date_published': rfc3339_date(entry['published']),
+            'date_modified': rfc3339_date(entry['updated']),
+            'authors': [{'name': entry['author']}],
+        }
+        if entry['group']:
+            item['tags'] = [entry['group']]
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ', '
+    yield ']}\n'
+
+
+WRITERS = {'atom': atom, 'rss': rss, 'json': json_feed}
+
+
+def _key(request):
+    location = f'{request.get_host()}{request.path}'
+    digest = hashlib.md5(location.encode()).hexdigest()
+    return f'feed:{changed_at("posts")}:{digest}'
+
+
+def _caching(key, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    # Оборванная отдача сюда не дойдёт и в кэш не попадёт.
+    cache.set(key, ''.join(parts), TIMEOUT)
+
+
+def _lazy(chunks):
+    # Запросы к базе начинаются, когда сервер читает первый кусок.
+    yield from chunks()
+
+
+def feed_response(request, fmt, title, description, link, posts):
+    """
+    Ответ с лентой из последних ITEMS постов posts. title, description
+    и link (путь страницы, которую лента повторяет) -- для заголовка.
+    """
+    key = _key(request) if stamps_shared() else None
+    content_type = FORMATS[fmt]
+    cached = key and cache.get(key)
+    if cached is not None:
+        return StreamingHttpResponse([cached], content_type=content_type)
+    posts = posts.select_related('author', 'group').order_by(
+        '-pub_date', '-id')[:ITEMS]
+
+    def chunks():
+        feed = {
+            'title': title,
+            'description': description,
+            'link': request.build_absolute_uri(link),
+            'url': request.build_absolute_uri(request.path),
+            'updated': max(posts.values_list('updated', flat=True),
+                           default=None) or timezone.now(),
+        }
+        # iterator() читает курсор соединения потока запроса: ответ
+        # отдаётся в нём же (см. blogging/asgi.py).
+        entries = (_entry(request, post) for post in posts.iterator())
+        return WRITERS[fmt](feed, entries)
+
+    stream = _lazy(chunks)
+    if key is not None:
+        stream = _caching(key, stream)
+    return StreamingHttpResponse(stream, content_type=content_type)
@@ -0,0 +1,147 @@
+"""
+Граф подписок: на кого подписан пользователь.
+
+Авторы, на которых подписан пользователь, лежат в кэше одной
+компактной записью FollowSet: отсортированный массив id по 4 байта или,
+если id плотные, битовая карта от наименьшего id -- что короче. Набор
+читается одним обращением к кэшу, а дальше проверка автора стоит O(1)
+по битовой карте или O(log n) двоичным поиском по массиву, так что
+целая страница авторов проверяется без запросов к базе. Ключ содержит
+отметку 'user:<id>' из conditional.py, которую двигает каждая подписка
+и отписка: старый набор просто перестаёт читаться. Без общего кэша
+(CACHE_SHARED) подписку в одном воркере отметка в остальных не
+заметит, поэтому набор тогда не кэшируется и читается из базы одним
+запросом, а is_following() проверяет одну строку через exists().
+
+follow() -- одна вставка INSERT ... ON CONFLICT DO NOTHING (INSERT OR
+IGNORE в SQLite) на уникальное ограничение 'follower': повторный клик
+и гонка двух одинаковых запросов не дают ни ошибки, ни второй строки.
+post_save при такой вставке не срабатывает, поэтому работу сигнала
+(счётчики, лента, отметки) follow() делает сама через followed(), если
+строка действительно вставлена.
+"""
+import struct
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+
+from . import counters
+from .conditional import changed_at, stamps_shared, touch
+from .jobs import enqueue
+from .models import Follow
+
+TIMEOUT = getattr(settings, 'FOLLOW_SET_TIMEOUT', 60 * 60 * 24)
+ARRAY = b'a'
+BITMAP = b'b'
+HEADER = struct.Struct('<cI')
+
+
+class FollowSet:
+    """Множество id авторов: сортированный array('I') или битовая карта."""
+
+    def __init__(self, kind, data, offset=0):
+        self.kind = kind
+        self.data = data
+        self.offset = offset
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = sorted(set(ids))
+        if not ids:
+            return cls(ARRAY, array('I'))
+        offset = ids[0]
+        size = (ids[-1] - offset) // 8 + 1
+        if size >= len(ids) * 4:
+            return cls(ARRAY, array('I', ids))
+        bits = bytearray(size)
+        for pk in ids:
+            shift = pk - offset
+            bits[shift >> 3] |= 1 << (shift & 7)
+        return cls(BITMAP, bytes(bits), offset)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        kind, offset = HEADER.unpack_from(raw)
+        data = raw[HEADER.size:]
+        if kind == ARRAY:
+            data = array('I', data)
+        return cls(kind, data, offset)
+
+    def to_bytes(self):
+        data = self.data.tobytes() if self.kind == ARRAY else self.data
+        return HEADER.pack(self.kind, self.offset) + data
+
+    def __contains__(self, pk):
+        if self.kind == BITMAP:
+            shift = pk - self.offset
+            return (0 <= shift < len(self.data) * 8
+                    and bool(self.data[shift >> 3] & (1 << (shift & 7))))
+        index = bisect_left(self.data, pk)
+        return index < len(self.data) and self.data[index] == pk
+
+
+def _key(user_id):
+    return f'follows:{user_id}:{changed_at(f"user:{user_id}")}'
+
+
+def _load(user_id):
+    return FollowSet.from_ids(
+        Follow.objects.filter(user=user_id).values_list('author', flat=True))
+
+
+def follow_set(user_id):
+    if not stamps_shared():
+        return _load(user_id)
+    key = _key(user_id)
+    raw = cache.get(key)
+    if raw is not None:
+        return FollowSet.from_bytes(raw)
+    follows = _load(user_id)
+    cache.set(key, follows.to_bytes(), TIMEOUT)
+    return follows
+
+
+def following(user, author_ids):
+    """Те id из author_ids, на которых подписан user."""
+    if not user.is_authenticated:
+        return set()
+    follows = follow_set(user.pk)
+    return {pk for pk in author_ids if pk in follows}
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated:
+        return False
+    if not stamps_shared():
+        # Один автор -- одна строка по индексу, весь набор не нужен.
+        return Follow.objects.filter(user=user, author=author_id).exists()
+    return author_id in follow_set(user.pk)
+
+
+def follow(user_id, author_id):
+    """Подписывает, если ещё не подписан. True -- подписка новая."""
+    db = router.db_for_write(Follow)
+    ops = connections[db].ops
+    columns = ', '.join(ops.quote_name(Follow._meta.get_field(name).column)
+                        for name in ('user', 'author'))
+    sql = (f'{ops.insert_statement(ignore_conflicts=True)} '
+           f'{ops.quote_name(Follow._meta.db_table)} ({columns}) '
+           f'VALUES (%s, %s)'
+           f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}')
+    with connections[db].cursor() as cursor:
+        cursor.execute(sql, [user_id, author_id])
+        created = cursor.rowcount == 1
+    if created:
+        followed(user_id, author_id)
+    return created
+
+
+def followed(user_id, author_id):
+    """Всё, что следует за новой подпиской; зовётся и из сигнала."""
+    counters.bump_user(author_id, 'follower_count', 1)
+    counters.bump_user(user_id, 'following_count', 1)
+    enqueue('timeline.backfill', user_id, author_id)
+    touch('posts', f'user:{user_id}', f'user:{author_id}')
@@ -0,0 +1,166 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Сигналы моделей не раскладывают пост по лентам, не индексируют его и не
+режут картинку сами, а ставят задачу через enqueue(). Строка Job пишется
+в той же транзакции, что и пост: откатится пост -- пропадёт и задача,
+а воркер (manage.py run_jobs) увидит её только после коммита. Так
+POST-запросы стоят столько же, сколько пара INSERT, как бы ни росла
+раскладка.
+
+Ключ идемпотентности (по умолчанию имя задачи и аргументы) уникален
+среди задач в очереди: десять правок поста подряд дают одну
+переиндексацию. Задача, упавшая с исключением, возвращается в очередь
+с экспоненциальной задержкой, после JOBS_MAX_ATTEMPTS попыток остаётся
+в статусе failed с трейсбеком. Задачу, которую воркер взял и не
+закончил за JOBS_TIMEOUT (упал процесс), подберёт другой воркер.
+Поэтому задачи должны переживать повторный запуск.
+
+С JOBS_EAGER задача выполняется сразу, в enqueue(). Так по умолчанию
+с LocMemCache (и под тестами): отметки «когда менялось», которые
+двигают задачи (tasks.py), из отдельного процесса run_jobs до
+веб-процессов дошли бы только через общий кэш. Исключение задачи тогда
+летит из enqueue() (JOBS_EAGER_PROPAGATE), чтобы сломанная задача
+роняла тесты, а не терялась в логе.
+"""
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+BACKOFF = getattr(settings, 'JOBS_BACKOFF', 10)
+MAX_BACKOFF = getattr(settings, 'JOBS_MAX_BACKOFF', 60 * 60)
+TIMEOUT = getattr(settings, 'JOBS_TIMEOUT', 60 * 10)
+CLAIM_CANDIDATES = 10
+
+TASKS = {}
+
+
+def task(name):
+    """Регистрирует функцию как задачу с именем name."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, *args, key=None, delay=0):
+    """
+    Ставит задачу name(*args). Если задача с таким ключом уже ждёт в
+    очереди, вторая не добавляется.
+    """
+    enqueue_many([(name, args, key)], delay=delay)
+
+
+def enqueue_many(calls, delay=0):
+    """Ставит задачи [(name, args, key), ...] одним INSERT."""
+    for name, args, key in calls:
+        if name not in TASKS:
+            raise KeyError(f'Неизвестная задача: {name}')
+    if getattr(settings, 'JOBS_EAGER', False):
+        for name, args, key in calls:
+            _run_eagerly(name, args)
+        return
+    run_at = timezone.now() + timedelta(seconds=delay)
+    jobs = []
+    for name, args, key in calls:
+        encoded = json.dumps(args)
+        jobs.append(Job(name=name, args=encoded,
+                        key=key or f'{name}:{encoded}', run_at=run_at))
+    Job.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def _run_eagerly(name, args):
+    # Упавшая задача роняет запрос, который её поставил (а с ним и тест).
+    # С JOBS_EAGER_PROPAGATE=False -- только пишется в лог, как у воркера.
+    try:
+        TASKS[name](*args)
+    except Exception:
+        if getattr(settings, 'JOBS_EAGER_PROPAGATE', True):
+            raise
+        logger.exception('Задача %s%r не удалась', name, tuple(args))
+
+
+def backoff(attempts):
+    """Пауза перед попыткой attempts + 1: 10 с, 20 с, 40 с... с разбросом."""
+    delay = min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+    return delay * random.uniform(1, 1.5)
+
+
+def claim():
+    """Берёт самую раннюю готовую задачу или None, если таких нет."""
+    now = timezone.now()
+    ready = (Q(status=Job.QUEUED, run_at__lte=now)
+             | Q(status=Job.RUNNING, locked_at__lt=now - timedelta(
+                 seconds=TIMEOUT)))
+    for job in Job.objects.filter(ready).order_by('run_at', 'id')[
+            :CLAIM_CANDIDATES]:
+        # Кто первым обновил строку, тот и выполняет задачу.
+        taken = Job.objects.filter(
+            pk=job.pk, status=job.status, locked_at=job.locked_at,
+        ).update(status=Job.RUNNING, locked_at=now,
+                 attempts=F('attempts') + 1)
+        if taken:
+            job.status, job.locked_at = Job.RUNNING, now
+            job.attempts += 1
+            return job
+    return None
+
+
+def _retry(job, error):
+    jobs = Job.objects.filter(pk=job.pk)
+    if job.attempts >= MAX_ATTEMPTS:
+        jobs.update(status=Job.FAILED, locked_at=None, last_error=error)
+        logger.error('Задача %s не удалась после %s попыток:\n%s',
+                     job.key, job.attempts, error)
+        return
+    run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+    try:
+        with transaction.atomic():
+            jobs.update(status=Job.QUEUED, locked_at=None, run_at=run_at,
+                        last_error=error)
+    except IntegrityError:
+        # Пока задача выполнялась, такую же поставили заново: та и
+        # сделает работу.
+        jobs.delete()
+
+
+def run(job):
+    """Выполняет взятую задачу, возвращает True при успехе."""
+    if job.attempts > MAX_ATTEMPTS:
+        # Прошлые попытки не вернулись: воркер падал посреди задачи.
+        _retry(job, job.last_error or 'Воркер не завершил задачу')
+        return False
+    try:
+        with transaction.atomic():
+            TASKS[job.name](*json.loads(job.args))
+    except Exception:
+        _retry(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи, пока они есть; (успешных, упавших)."""
+    done = failed = 0
+    while limit is None or done + failed < limit:
+        job = claim()
+        if job is None:
+            break
+        if run(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
@@ -0,0 +1,98 @@
+import json
+import platform
+from contextlib import nullcontext
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from blogging.template_profile import profile_templates
+from posts import benchmark, datagen
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, число запросов и память горячих страниц '
+            'на отдельной тестовой базе с 10k, 100k и 1M постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[10000, 100000, 1000000])
+        parser.add_argument('--endpoints', nargs='+',
+                            choices=benchmark.ENDPOINTS,
+                            default=list(benchmark.ENDPOINTS))
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='куда записать JSON')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого прогона: упасть, если '
+                                 'какая-то страница делает больше запросов')
+        parser.add_argument('--tolerance', type=int, default=0,
+                            help='сколько лишних запросов прощать')
+        parser.add_argument('--templates', action='store_true',
+                            help='напечатать время по шаблонам и тегам')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+
+        # Данные генерируются в тестовой базе, рабочая не трогается.
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        profiling = (profile_templates() if options['templates']
+                     else nullcontext())
+        try:
+            with profiling as profile:
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if profile is not None:
+            self.stderr.write(profile.report())
+
+        report = {
+            'started': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        else:
+            json.dump(report, self.stdout, ensure_ascii=False, indent=2)
+            self.stdout.write('')
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline,
+                                            options['tolerance'])
+            if regressions:
+                raise CommandError('Запросов стало больше:\n'
+                                   + '\n'.join(regressions))
+
+    def run(self, options):
+        results = []
+        for size in sorted(options['sizes']):
+            missing = size - Post.objects.count()
+            if missing > 0:
+                self.stderr.write(f'Генерация до {size} постов')
+                datagen.generate(missing, seed=options['seed'] + size,
+                                 log=self.stderr.write)
+            for row in benchmark.run(options['endpoints'],
+                                     requests=options['requests'],
+                                     warmup=options['warmup'],
+                                     seed=options['seed']):
+                mode = {True: 'поток', False: 'render'}.get(
+                    row.get('streaming'), '')
+                self.stderr.write(
+                    f"{size:>8} {row['endpoint']:<13} {mode:<6} "
+                    f"p50 {row['p50_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  "
+                    f"TTFB p50 {row['ttfb_p50_ms']:>8} ms  "
+                    f"{row['queries']:>3} запросов  "
+                    f"{row['memory_peak_kib']:>8} KiB")
+                results.append(row)
+        return results
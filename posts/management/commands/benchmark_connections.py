@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сколько медленных клиентов держит запущенный сервер: '
+            'сравнение gunicorn (blogging.wsgi) и uvicorn (blogging.asgi)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='например http://127.0.0.1:8000/')
+        parser.add_argument('--levels', type=int, nargs='+',
+                            default=[10, 50, 100, 250, 500, 1000])
+        parser.add_argument('--hold', type=float, default=5.0,
+                            help='сколько секунд клиент тянет с запросом')
+        parser.add_argument('--timeout', type=float, default=2.0)
+        parser.add_argument('--output', help='куда записать JSON')
+
+    def handle(self, *args, **options):
+        results = benchmark.connection_capacity(
+            options['url'], options['levels'], options['hold'],
+            options['timeout'])
+        for row in results:
+            probe = row['probe_ms']
+            self.stderr.write(
+                f"{row['connections']:>6} соединений: обслужено "
+                f"{row['served']:>6}, пробный запрос "
+                f"{f'{probe} ms' if probe is not None else 'не дождался'}")
+        report = json.dumps({'url': options['url'], 'hold': options['hold'],
+                             'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
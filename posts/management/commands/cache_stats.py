@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blogging.cache import cache_stats, flush_stats, reset_stats
+
+NAMES = ('pages', 'cards')
+
+
+class Command(BaseCommand):
+    help = ('Показывает попадания и промахи кэша страниц и карточек '
+            'по всем воркерам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='обнулить счётчики после вывода')
+
+    def handle(self, *args, **options):
+        flush_stats()
+        for name, stats in cache_stats(NAMES).items():
+            total = stats['hits'] + stats['misses']
+            ratio = f'{stats["hits"] / total:.1%}' if total else '—'
+            self.stdout.write(f'{name}: попаданий {stats["hits"]}, '
+                              f'промахов {stats["misses"]}, доля {ratio}')
+        if options['reset']:
+            reset_stats(NAMES)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого почитать» для пользователей, '
+            'чьи подписки изменились')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='пересчитать всех, а не только изменившихся')
+        parser.add_argument('--engine', choices=('sparse', 'python'),
+                            help='матрицы SciPy или словари; по умолчанию '
+                                 'sparse, если SciPy установлен')
+
+    def handle(self, *args, **options):
+        try:
+            users, total = suggestions.recompute(
+                full=options['all'], engine=options['engine'],
+                log=self.stdout.write)
+        except ImportError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, рекомендаций: {total}'))
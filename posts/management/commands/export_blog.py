@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, сообщества, посты, комментарии и '
+            'подписки в NDJSON (сжатый, если файл оканчивается на .gz)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл дампа, например blog.ndjson.gz')
+        parser.add_argument('--media',
+                            help='каталог, куда скопировать картинки постов')
+
+    def handle(self, *args, **options):
+        written = transfer.export(options['path'], media=options['media'],
+                                  log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            'Выгружено: ' + ', '.join(f'{label} {count}'
+                                      for label, count in written.items())))
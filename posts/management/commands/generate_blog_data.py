@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import datagen
+
+
+class Command(BaseCommand):
+    help = ('Добавляет в базу посты и пропорциональное число пользователей, '
+            'сообществ, комментариев и подписок для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--index', action='store_true',
+                            help='заодно перестроить поисковый индекс')
+
+    def handle(self, *args, **options):
+        created = datagen.generate(options['posts'], seed=options['seed'],
+                                   index=options['index'],
+                                   log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            'Добавлено: ' + ', '.join(f'{name} {count}'
+                                      for name, count in created.items())))
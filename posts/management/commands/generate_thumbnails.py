@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает превью для картинок постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='пересоздать превью у всех постов')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        done = 0
+        for post in posts.only('image', 'thumbnails').iterator():
+            if options['all'] or thumbnails.needs_thumbnails(post):
+                thumbnails.generate(post.pk)
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
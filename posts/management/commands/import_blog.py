@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает дамп export_blog пачками; прерванную загрузку '
+            'можно продолжить, запустив команду снова')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл дампа')
+        parser.add_argument('--media',
+                            help='каталог с картинками из export_blog --media')
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help='снять индексы постов и комментариев на '
+                                 'время загрузки')
+        parser.add_argument('--index', action='store_true',
+                            help='заодно перестроить поисковый индекс')
+        parser.add_argument('--restart', action='store_true',
+                            help='начать сначала, не глядя на checkpoint')
+
+    def handle(self, *args, **options):
+        loaded = transfer.load(
+            options['path'], media=options['media'],
+            defer_indexes=options['defer_indexes'], index=options['index'],
+            restart=options['restart'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено: ' + ', '.join(f'{label} {count}'
+                                      for label, count in loaded.items())))
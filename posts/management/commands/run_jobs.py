@@ -0,0 +1,37 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди (раскладка, поиск, превью)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='выполнить готовые задачи и выйти')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='пауза, когда очередь пуста, в секундах')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        while not self.stopping:
+            # Как в цикле запросов: не держать оборванные соединения.
+            close_old_connections()
+            done, failed = jobs.run_pending(limit=100)
+            if done or failed:
+                self.stdout.write(
+                    f'Выполнено задач: {done}, с ошибкой: {failed}')
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+        close_old_connections()
+
+    def stop(self, signum, frame):
+        # Текущая задача доработает, новые браться не будут.
+        self.stopping = True
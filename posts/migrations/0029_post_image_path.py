@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 05:27
+
+from django.db import migrations, models
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=posts.models.post_image_path),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_unfanned(apps, schema_editor):
+    # До этой миграции посты популярных авторов подмешивались при чтении:
+    # запоминаем это в самих постах и убираем их старые копии из лент.
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    limit = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+    popular = Post.objects.filter(author__counters__follower_count__gte=limit)
+    popular.update(fanned_out=False)
+    TimelineEntry.objects.filter(post__fanned_out=False).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0033_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(fanned_out=False), fields=['author', '-pub_date', '-id'], name='post_unfanned_idx'),
+        ),
+        migrations.RunPython(mark_unfanned, migrations.RunPython.noop),
+    ]
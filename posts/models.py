@@ -1,32 +1,98 @@
+import hashlib
+import json
+import os
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
 
+def post_image_path(instance, filename):
+    """posts/<хэш содержимого>.<расширение>: такой файл можно кэшировать навсегда."""
+    digest = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(filename)[1].lower()
+    return f'posts/{digest.hexdigest()[:20]}{extension}'
+
+
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, count=True, **kwargs):
+        """count=False -- счётчики потом пересчитает вызывающий."""
+        from .counters import count_new_posts
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if count and not kwargs.get('ignore_conflicts'):
+            count_new_posts(objs)
+        return objs
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст',
                             help_text='Дайте волю графоманству')
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
-                               related_name="posts")
+                               related_name="posts",
+                               db_index=False)
     group = models.ForeignKey('Group',
                               on_delete=models.SET_NULL,
+                              db_index=False,
                               blank=True,
                               null=True,
                               related_name='posts',
                               verbose_name='Сообщество',
                               help_text='Здесь можно выбрать '
                                         'сообщество для поста')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to=post_image_path, blank=True, null=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    thumbnails = models.TextField(blank=True, default='', editable=False)
+    # False -- пост автора с большим числом подписчиков: в ленты он не
+    # разложен и подмешивается при чтении (см. posts.timeline).
+    fanned_out = models.BooleanField(default=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            # Профиль и сообщество: фильтр по автору или сообществу и
+            # тот же порядок, что у главной. Они же заменяют индексы FK.
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_unfanned_idx',
+                         condition=models.Q(fanned_out=False)),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def thumbnail_manifest(self):
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
+    def srcset(self, fmt):
+        return ', '.join(
+            f'{default_storage.url(path)} {width}w'
+            for width, path in self.thumbnail_manifest.get(fmt, ())
+        )
+
+    @property
+    def srcset_jpeg(self):
+        return self.srcset('jpeg')
+
+    @property
+    def srcset_webp(self):
+        return self.srcset('webp')
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -40,7 +106,8 @@ class Group(models.Model):
 class Comment(models.Model):
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
-                             related_name="comments")
+                             related_name="comments",
+                             db_index=False)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name="comments")
@@ -48,6 +115,12 @@ class Comment(models.Model):
                             help_text='будьте тактичны')
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -55,12 +128,143 @@ class Comment(models.Model):
 class Follow(models.Model):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
-                             related_name="follower")
+                             related_name="follower",
+                             db_index=False)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
-                               related_name="following")
+                               related_name="following",
+                               db_index=False)
 
     class Meta:
+        # (user, author) из ограничения ищет подписки пользователя,
+        # (author, user) -- подписчиков автора.
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'], name='follower')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="counters")
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class Suggestion(models.Model):
+    """Кого почитать: готовые рекомендации, см. posts/suggestions.py."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="suggestions",
+                             db_index=False)
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='suggestion')
+        ]
+
+
+class SuggestionState(models.Model):
+    """Отпечаток подписок, по которым посчитаны рекомендации."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="+")
+    fingerprint = models.CharField(max_length=32)
+    computed = models.DateTimeField(auto_now=True)
+
+
+class SearchDocument(models.Model):
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    url = models.CharField(max_length=255)
+    text = models.TextField()
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'],
+                                    name='search_document')
+        ]
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument,
+                                 on_delete=models.CASCADE,
+                                 related_name="terms")
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'document'],
+                         name='search_term_document_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Отложенная работа для воркера, см. posts/jobs.py."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (FAILED, 'не удалась'),
+    )
+
+    name = models.CharField(max_length=100)
+    args = models.TextField(default='[]')
+    key = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'],
+                                    condition=models.Q(status='queued'),
+                                    name='job_queued_key')
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.key
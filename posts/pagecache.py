@@ -0,0 +1,115 @@
+"""
+Кэш целых страниц для анонимных читателей.
+
+Запрос без сессионной куки к index, group, profile или post отдаётся
+из кэша, минуя сессии, аутентификацию, CSRF и шаблоны. Ключ -- хост,
+путь с query и поколение: отметка 'posts' из conditional.py, которую
+сигналы Post, Comment, Group и Follow двигают при каждом изменении,
+так что весь кэш страниц устаревает разом, без перебора ключей.
+Пересчёт популярной страницы защищён от набега через get_or_compute.
+
+Ответы получают s-maxage и stale-while-revalidate для CDN. Залогиненные
+(есть сессионная кука), POST и ответы, ставящие куки, мимо кэша.
+Потоковый ответ на промахе читается до конца и отдаётся уже из памяти.
+
+PAGE_CACHE по умолчанию включён только с общим кэшем (CACHE_SHARED):
+с LocMemCache правка в одном воркере не сдвинет отметку в остальных, и
+те до PAGE_CACHE_TIMEOUT отдавали бы старую страницу. С LocMemCache
+выключен он и под тестами -- кэш переживает откат базы между тестами;
+тесты самого кэша включают его через override_settings.
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import parse_http_date_safe
+
+from blogging.cache import get_or_compute
+
+from .conditional import changed_at
+
+CACHED_VIEWS = ('index', 'group', 'profile', 'post')
+TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+S_MAXAGE = getattr(settings, 'PAGE_CACHE_S_MAXAGE', 60)
+STALE_WHILE_REVALIDATE = getattr(settings, 'PAGE_CACHE_STALE', 60 * 5)
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def page_key(request):
+    location = f'{request.get_host()}{request.get_full_path()}'
+    digest = hashlib.md5(location.encode()).hexdigest()
+    return f'page:{changed_at("posts")}:{digest}'
+
+
+def _cacheable_request(request):
+    if not getattr(settings, 'PAGE_CACHE', False) or request.method != 'GET':
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    try:
+        return resolve(request.path_info).url_name in CACHED_VIEWS
+    except Resolver404:
+        return False
+
+
+def _freeze(response):
+    if response.status_code != 200 or response.cookies:
+        return None
+    patch_cache_control(response, s_maxage=S_MAXAGE,
+                        stale_while_revalidate=STALE_WHILE_REVALIDATE)
+    # Потоковую ленту (streaming.py) в кэш кладём собранной целиком.
+    content = (b''.join(response.streaming_content) if response.streaming
+               else response.content)
+    return response.status_code, list(response.items()), content
+
+
+def _thaw(frozen):
+    status, headers, content = frozen
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+class AnonymousPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _cacheable_request(request):
+            return self.get_response(request)
+
+        rendered = []
+
+        def render():
+            response = self.get_response(request)
+            rendered.append(response)
+            frozen = _freeze(response)
+            if frozen is None:
+                raise Uncacheable
+            return frozen
+
+        try:
+            frozen = get_or_compute(page_key(request), render, TIMEOUT,
+                                    stats='pages')
+        except Uncacheable:
+            return rendered[0]
+        if rendered:
+            response = rendered[0]
+            if response.streaming:
+                response = _thaw(frozen)
+            response['X-Page-Cache'] = 'miss'
+            return response
+
+        response = _thaw(frozen)
+        response['X-Page-Cache'] = 'hit'
+        return get_conditional_response(
+            request, etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')),
+            response=response)
@@ -0,0 +1,244 @@
+import base64
+import binascii
+import heapq
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.db.models import DateField, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 50
+COMMENT_ORDERING = ('created', 'id')
+
+
+def encode_cursor(values):
+    value, pk = values
+    if isinstance(value, datetime):
+        value = 'd' + value.isoformat()
+    else:
+        value = 'n' + repr(float(value))
+    raw = f'{value}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, expected=None):
+    """
+    Возвращает пару (дата или число, id) или None, если курсор испорчен
+    или его вид не тот, что expected ('d' -- дата, 'n' -- число).
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().split('|')
+        kind, value = value[:1], value[1:]
+        if expected is not None and kind != expected:
+            return None
+        if kind == 'd':
+            value = parse_datetime(value)
+        elif kind == 'n':
+            value = float(value)
+        else:
+            return None
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, position='',
+                 next_values=None, previous_values=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.position = position
+        self._next_values = next_values
+        self._previous_values = previous_values
+
+    def __repr__(self):
+        return f'<CursorPage {self.position or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._next_values is not None
+
+    def has_previous(self):
+        return self._previous_values is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self._next_values is None:
+            return ''
+        return encode_cursor(self._next_values)
+
+    @property
+    def previous_cursor(self):
+        if self._previous_values is None:
+            return ''
+        return encode_cursor(self._previous_values)
+
+
+class StreamedPage(CursorPage):
+    """
+    Страница, строки которой приходят из базы по ходу перебора.
+    has_next(), next_cursor и len() верны только после первого полного
+    перебора; повторный перебор идёт по уже прочитанным строкам.
+    """
+
+    def __init__(self, rows, paginator, position='', after=False):
+        super().__init__([], paginator, position)
+        self._rows = rows
+        self._after = after
+
+    def __iter__(self):
+        if self._rows is None:
+            yield from self.object_list
+            return
+        rows, self._rows = self._rows, None
+        key_values = self.paginator.key_values
+        for obj in rows:
+            if len(self.object_list) == self.paginator.per_page:
+                self._next_values = key_values(self.object_list[-1])
+                break
+            if not self.object_list and self._after:
+                self._previous_values = key_values(obj)
+            self.object_list.append(obj)
+            yield obj
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (keyset) вместо OFFSET и COUNT(*).
+
+    ordering -- пара полей: дата (или число, например релевантность) и
+    уникальный id для разрешения равенства, с одинаковым направлением
+    сортировки. Страница выбирается условием по этой паре, поэтому при
+    подходящем индексе любая страница читается ограниченным диапазоном
+    индекса. object_list может быть списком
+    querysets с одинаковыми полями ordering -- они сливаются в одну ленту.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        if not isinstance(object_list, (list, tuple)):
+            object_list = [object_list]
+        self.sources = object_list
+        self.per_page = int(per_page)
+        self.descending = ordering[0].startswith('-')
+        self.keys = tuple(field.lstrip('-') for field in ordering)
+
+    def key_values(self, obj):
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    @cached_property
+    def cursor_kind(self):
+        """Вид курсора по первому полю ordering: 'd' -- дата, 'n' -- число."""
+        queryset = self.sources[0]
+        field = queryset.query.annotations.get(self.keys[0])
+        if field is None:
+            field = queryset.model._meta.get_field(self.keys[0])
+        else:
+            field = field.output_field
+        return 'd' if isinstance(field, DateField) else 'n'
+
+    def decode(self, token):
+        return decode_cursor(token, self.cursor_kind)
+
+    def get_page(self, after=None, before=None):
+        after = self.decode(after)
+        before = self.decode(before) if after is None else None
+        backwards = before is not None
+        cursor = after or before
+        position = ''
+        if cursor is not None:
+            direction = 'before' if backwards else 'after'
+            position = f'{direction}={encode_cursor(cursor)}'
+        rows = self._fetch(cursor, backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return CursorPage([], self, position)
+        first = self.key_values(rows[0])
+        last = self.key_values(rows[-1])
+        if backwards:
+            return CursorPage(rows, self, position, next_values=last,
+                              previous_values=first if has_more else None)
+        return CursorPage(rows, self, position,
+                          next_values=last if has_more else None,
+                          previous_values=first if after else None)
+
+    def stream_page(self, after=None, before=None, chunk_size=None):
+        """
+        Как get_page, но строки читаются из базы по мере перебора
+        страницы (iterator() кусками по chunk_size). Страница назад
+        сортируется в обратную сторону и читается целиком, как в get_page.
+        """
+        cursor = self.decode(after)
+        if cursor is None and self.decode(before) is not None:
+            return self.get_page(after, before)
+        position = f'after={encode_cursor(cursor)}' if cursor else ''
+        return StreamedPage(self._rows(cursor, False, chunk_size), self,
+                            position, after=cursor is not None)
+
+    def _fetch(self, cursor, backwards):
+        return list(self._rows(cursor, backwards))
+
+    def _rows(self, cursor, backwards, chunk_size=None):
+        """До per_page + 1 строк по порядку страницы, лениво."""
+        reverse = self.descending != backwards
+        chunks = [self._slice(queryset, cursor, reverse, chunk_size)
+                  for queryset in self.sources]
+        if len(chunks) == 1:
+            yield from chunks[0]
+            return
+        seen = set()
+        for obj in heapq.merge(*chunks, key=self.key_values, reverse=reverse):
+            key = self.key_values(obj)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield obj
+            if len(seen) > self.per_page:
+                return
+
+    def _slice(self, queryset, cursor, reverse, chunk_size=None):
+        first, second = self.keys
+        if cursor is not None:
+            value, pk = cursor
+            op = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{first}__{op}e': value}),
+                Q(**{f'{first}__{op}': value}) | Q(**{f'{second}__{op}': pk})
+            )
+        prefix = '-' if reverse else ''
+        queryset = queryset.order_by(prefix + first, prefix + second)
+        queryset = queryset[:self.per_page + 1]
+        if chunk_size is None:
+            return list(queryset)
+        return queryset.iterator(chunk_size=chunk_size)
+
+
+def get_page(request, object_list, per_page=POSTS_PER_PAGE, **kwargs):
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.get_page(request.GET.get('after'),
+                              request.GET.get('before'))
+
+
+def stream_page(request, object_list, per_page=POSTS_PER_PAGE,
+                chunk_size=None, **kwargs):
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.stream_page(request.GET.get('after'),
+                                 request.GET.get('before'), chunk_size)
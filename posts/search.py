@@ -0,0 +1,177 @@
+"""
+Полнотекстовый поиск по постам, комментариям и сообществам.
+
+Индекс инвертированный и хранится в таблицах SearchDocument (что нашли)
+и SearchTerm (терм -> документ, частота), поэтому работает на любой СУБД.
+FTS5 из SQLite не подошёл: в нём нет русского стемминга, а без него
+«сообщества» не находятся по запросу «сообщество». Индекс обновляется
+фоновыми задачами, которые ставят сигналы моделей (tasks.py), полная
+перестройка -- командой rebuild_search_index.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              Sum, Value, When)
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Group, Post, SearchDocument, SearchTerm
+from .stemmer import stem
+
+WORD = re.compile(r'(\w+)')
+CYRILLIC = re.compile('[а-яё]')
+MAX_TERM_LENGTH = 64
+LENGTH_NORM = 10
+SNIPPET_WORDS = 20
+SEARCH_ORDERING = ('-score', '-id')
+KINDS = {Post: 'post', Comment: 'comment', Group: 'group'}
+
+
+def normalize(word):
+    word = word.lower()
+    if CYRILLIC.search(word):
+        word = stem(word)
+    return word[:MAX_TERM_LENGTH]
+
+
+def terms(text):
+    return [normalize(word) for word in WORD.findall(text) if len(word) > 1]
+
+
+def describe(obj):
+    """(kind, object_id, title, url, text) для индексируемого объекта."""
+    if isinstance(obj, Post):
+        url = reverse('post', args=[obj.author.username, obj.id])
+        return 'post', obj.id, f'@{obj.author.username}', url, obj.text
+    if isinstance(obj, Comment):
+        url = reverse('post', args=[obj.post.author.username, obj.post_id])
+        return ('comment', obj.id, f'Комментарий @{obj.author.username}',
+                f'{url}#comment_{obj.id}', obj.text)
+    url = reverse('group', args=[obj.slug])
+    return 'group', obj.id, obj.title, url, f'{obj.title}\n{obj.description}'
+
+
+def _document(obj):
+    kind, object_id, title, url, text = describe(obj)
+    counts = Counter(terms(text))
+    document = SearchDocument(kind=kind, object_id=object_id, title=title,
+                              url=url, text=text,
+                              length=sum(counts.values()))
+    return document, counts
+
+
+def index_object(obj):
+    document, counts = _document(obj)
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=document.kind,
+                                      object_id=document.object_id).delete()
+        document.save()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(document=document, term=term, frequency=frequency)
+            for term, frequency in counts.items())
+
+
+def remove_object(obj):
+    SearchDocument.objects.filter(kind=KINDS[type(obj)],
+                                  object_id=obj.pk).delete()
+
+
+def index_batch(objects):
+    """Индексирует пачку объектов одной модели за несколько запросов."""
+    if not objects:
+        return
+    pairs = [_document(obj) for obj in objects]
+    kind = pairs[0][0].kind
+    ids = [document.object_id for document, _ in pairs]
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=ids).delete()
+        SearchDocument.objects.bulk_create(document for document, _ in pairs)
+        saved = dict(SearchDocument.objects.filter(
+            kind=kind, object_id__in=ids).values_list('object_id', 'id'))
+        SearchTerm.objects.bulk_create(
+            SearchTerm(document_id=saved[document.object_id], term=term,
+                       frequency=frequency)
+            for document, counts in pairs
+            for term, frequency in counts.items())
+
+
+def reindex(batch_size=500):
+    querysets = [
+        Post.objects.select_related('author'),
+        Comment.objects.select_related('author', 'post__author'),
+        Group.objects.all(),
+    ]
+    total = 0
+    for queryset in querysets:
+        batch = []
+        for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                index_batch(batch)
+                total += len(batch)
+                batch = []
+        index_batch(batch)
+        total += len(batch)
+    return total
+
+
+def _idf(documents, frequency):
+    return math.log(1 + documents / frequency)
+
+
+def search(query, documents=None):
+    """Возвращает (queryset документов с полем score, термы запроса).
+
+    documents -- число документов в индексе для idf. Первая страница
+    поиска считает его, следующие получают то же число из ссылки: иначе
+    оценки, а с ними и курсор по score, сдвигались бы между страницами.
+    """
+    stems = sorted(set(terms(query)))
+    frequencies = dict(
+        SearchTerm.objects.filter(term__in=stems).order_by()
+        .values_list('term').annotate(Count('id'))
+    )
+    if not stems or len(frequencies) < len(stems):
+        empty = SearchDocument.objects.none().annotate(
+            score=Value(0.0, output_field=FloatField()))
+        return empty, stems
+    if documents is None:
+        documents = SearchDocument.objects.count()
+    weight = Sum(Case(
+        *[When(terms__term=term,
+               then=ExpressionWrapper(
+                   F('terms__frequency') * _idf(documents, frequency),
+                   output_field=FloatField()))
+          for term, frequency in frequencies.items()],
+        output_field=FloatField(),
+    ))
+    results = (
+        SearchDocument.objects.filter(terms__term__in=stems)
+        .annotate(matched=Count('terms'),
+                  score=ExpressionWrapper(
+                      weight / (F('length') + LENGTH_NORM),
+                      output_field=FloatField()))
+        .filter(matched=len(stems))
+    )
+    return results, stems
+
+
+def highlight(text, stems, size=SNIPPET_WORDS):
+    """Фрагмент текста вокруг первого совпадения, совпадения в <mark>."""
+    parts = WORD.split(text)
+    stems = set(stems)
+    matches = [i for i in range(1, len(parts), 2)
+               if normalize(parts[i]) in stems]
+    first = matches[0] if matches else 1
+    start = max(0, first - size)
+    end = min(len(parts), first + 2 * size)
+    html = [escape(part) if i % 2 == 0 or normalize(part) not in stems
+            else f'<mark>{escape(part)}</mark>'
+            for i, part in enumerate(parts[start:end], start)]
+    prefix = '… ' if start > 0 else ''
+    suffix = ' …' if end < len(parts) else ''
+    return mark_safe(prefix + ''.join(html).strip() + suffix)
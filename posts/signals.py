@@ -0,0 +1,88 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, follows, search, thumbnails, timeline
+from .conditional import touch
+from .cards import forget_card
+from .jobs import enqueue, enqueue_many
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # Вся отложенная работа по посту -- одним INSERT в очередь.
+    jobs = [('search.index', (search.KINDS[Post], instance.pk), None)]
+    if created:
+        counters.bump_user(instance.author_id, 'post_count', 1)
+        jobs.append(('timeline.fan_out', (instance.pk,), None))
+    if thumbnails.needs_thumbnails(instance):
+        jobs.append(('thumbnails.generate', (instance.pk,),
+                     f'thumbnails:{instance.pk}:{instance.image.name}'))
+    enqueue_many(jobs)
+    touch('posts', f'user:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'post_count', -1)
+    forget_card(instance)
+    touch('posts', f'user:{instance.author_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    # Название и slug сообщества есть в карточках его постов
+    if not raw:
+        instance.posts.update(updated=timezone.now())
+        touch('posts')
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+        touch('posts')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    touch('posts')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'follower_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    touch('posts', f'user:{instance.user_id}', f'user:{instance.author_id}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Group)
+def index_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue('search.index', search.KINDS[sender], instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Group)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_object(instance)
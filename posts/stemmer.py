@@ -0,0 +1,71 @@
+"""
+Стеммер для русского языка по алгоритму Snowball (Russian stemming
+algorithm М. Портера). Отрезает окончания, чтобы «сообщества»,
+«сообществом» и «сообщество» попадали в один терм поискового индекса.
+"""
+import re
+
+VOWELS = re.compile('[аеиоуыэюя]')
+NON_VOWEL_AFTER_VOWEL = re.compile('[аеиоуыэюя][^аеиоуыэюя]')
+
+PERFECTIVE_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:в|вши|вшись)|(?:ив|ивши|ившись|ыв|ывши|ывшись))$')
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+ADJECTIVAL = re.compile(
+    r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|(?:ивш|ывш|ующ))?'
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|'
+    r'их|ых|ую|юю|ая|яя|ою|ею)$')
+VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)|'
+    r'(?:ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю))$')
+NOUN = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'ейше?$')
+
+
+def _strip(pattern, word):
+    return pattern.sub('', word, count=1)
+
+
+def _region(word, start):
+    match = NON_VOWEL_AFTER_VOWEL.search(word, start)
+    return match.end() if match else len(word)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    match = VOWELS.search(word)
+    if match is None:
+        return word
+    prefix, rv = word[:match.end()], word[match.end():]
+    r2 = _region(word, _region(word, 0)) - len(prefix)
+
+    stripped = _strip(PERFECTIVE_GERUND, rv)
+    if stripped == rv:
+        rv = _strip(REFLEXIVE, rv)
+        stripped = _strip(ADJECTIVAL, rv)
+        if stripped == rv:
+            stripped = _strip(VERB, rv)
+            if stripped == rv:
+                stripped = _strip(NOUN, rv)
+    rv = stripped
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    match = DERIVATIONAL.search(rv)
+    if match and match.start() >= r2:
+        rv = rv[:match.start()]
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        stripped = _strip(SUPERLATIVE, rv)
+        if stripped != rv:
+            rv = stripped[:-1] if stripped.endswith('нн') else stripped
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
@@ -0,0 +1,82 @@
+"""
+Потоковая отрисовка лент постов.
+
+render() собирает страницу в одну строку, и первый байт уходит клиенту
+только после того, как прочитаны все посты и отрисованы все карточки.
+render_posts() отдаёт ленту через StreamingHttpResponse: шаблон
+страницы рисуется один раз с меткой на месте списка постов
+(include/post_list.html), всё до метки -- head, шапка, меню, карточка
+автора -- уходит сразу, затем посты идут кусками по STREAM_CHUNK, по
+мере того как строки приходят из базы (кэш карточек читается одним
+get_many на кусок), а в конце -- навигация по страницам, ссылки которой
+известны только после последней строки, и остаток шаблона.
+
+Поток читается до конца в том же потоке, где отработал view: строки
+идут из курсора его соединения с базой, и бюджет запросов
+(blogging/queries.py) видит их через обёртку этого же соединения.
+WSGI-серверы так и отдают ответ, ASGI-вход (blogging/asgi.py) тоже.
+
+STREAM_PAGES=False возвращает обычный render(). Анонимные страницы
+кэш страниц (pagecache.py) всё равно собирает целиком, так что поток
+выигрывает прежде всего у залогиненных и на промахах кэша.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.context import make_context
+from django.template.loader import get_template, render_to_string
+
+from .cards import attach_cards
+from .paginator import get_page, stream_page
+
+MARKER = '<!-- posts -->'
+ITEM_TEMPLATE = 'include/post_item.html'
+PAGINATOR_TEMPLATE = 'include/cursor_paginator.html'
+CHUNK = getattr(settings, 'STREAM_CHUNK', 5)
+
+
+def render_posts(request, template_name, context, object_list, **kwargs):
+    """
+    Страница ленты: object_list листается по курсору (kwargs уходят в
+    CursorPaginator) и попадает в шаблон как page.
+    """
+    if not getattr(settings, 'STREAM_PAGES', True):
+        page = attach_cards(get_page(request, object_list, **kwargs),
+                            request)
+        return render(request, template_name, {**context, 'page': page})
+    page = stream_page(request, object_list, chunk_size=CHUNK, **kwargs)
+    html = render_to_string(template_name, {**context, 'page': page,
+                                            'stream_marker': MARKER},
+                            request)
+    head, tail = html.split(MARKER)
+    return StreamingHttpResponse(_chunks(request, head, page, tail))
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _chunks(request, head, page, tail):
+    yield head
+    # Один RequestContext на все карточки: контекст-процессоры
+    # отрабатывают один раз, а не на каждый пост.
+    item = get_template(ITEM_TEMPLATE).template
+    context = make_context({'page': page}, request)
+    with context.bind_template(item):
+        for batch in _batches(page, CHUNK):
+            attach_cards(batch, request)
+            parts = []
+            for post in batch:
+                with context.push(post=post):
+                    parts.append(item.render(context))
+            yield ''.join(parts)
+        if page.has_other_pages():
+            yield get_template(PAGINATOR_TEMPLATE).template.render(context)
+    yield tail
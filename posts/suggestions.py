@@ -0,0 +1,192 @@
+"""
+«Кого почитать»: рекомендации авторов по графу подписок.
+
+Считаются офлайн командой compute_suggestions для всех пользователей
+сразу. Для пользователя u и автора x складываются два сигнала:
+
+- друзья друзей: сколько авторов, на которых подписан u, сами подписаны
+  на x;
+- со-подписка: насколько x похож на авторов u -- косинусная близость
+  авторов по общим подписчикам, просуммированная по авторам u.
+
+Сумма делится на число подписок u, уже прочитанные авторы и сам u
+отбрасываются, TOP_K лучших пишутся в Suggestion. С NumPy и SciPy оба
+сигнала -- произведения разреженных матриц CSR пользователь × автор
+(A·A и A·D·Aᵀ·A·D, где D -- 1/√подписчиков автора) по пачкам строк;
+без них тот же расчёт идёт словарями, медленнее, но с теми же числами.
+
+Пересчёт инкрементальный: рядом с рекомендациями хранится отпечаток
+подписок пользователя (SuggestionState), и считаются только те, чей
+набор подписок изменился с прошлого раза. Изменения у тех, на кого он
+подписан, подхватит полный пересчёт (--all).
+
+Виджет профиля читает готовые рекомендации одним запросом
+(for_user), а авторов, на которых пользователь подписался после
+расчёта, отсеивает по набору подписок из кэша (follows.py).
+"""
+import hashlib
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import follows
+from .conditional import touch
+from .models import Follow, Suggestion, SuggestionState, User
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+TOP_K = getattr(settings, 'SUGGESTIONS_TOP_K', 10)
+WIDGET_SIZE = getattr(settings, 'SUGGESTIONS_SHOWN', 5)
+BATCH_SIZE = 1000
+PRECISION = 6
+
+
+def load_graph():
+    """{пользователь: [авторы по возрастанию id]} для всех пользователей."""
+    graph = {pk: [] for pk in User.objects.values_list('pk', flat=True)
+             .iterator(chunk_size=10000)}
+    edges = Follow.objects.order_by('user', 'author').values_list(
+        'user', 'author')
+    for user_id, author_id in edges.iterator(chunk_size=10000):
+        graph[user_id].append(author_id)
+    return graph
+
+
+def fingerprint(author_ids):
+    return hashlib.md5(','.join(map(str, author_ids)).encode()).hexdigest()
+
+
+def changed_users(graph):
+    """Пользователи, чьи подписки не совпадают с отпечатком расчёта."""
+    stored = dict(SuggestionState.objects.values_list('user', 'fingerprint')
+                  .iterator(chunk_size=10000))
+    return [pk for pk, authors in graph.items()
+            if stored.get(pk) != fingerprint(authors)]
+
+
+def _top(user_id, followed, scores):
+    skip = set(followed)
+    skip.add(user_id)
+    scale = 1 / len(followed)
+    ranked = ((round(score * scale, PRECISION), author_id)
+              for author_id, score in scores if author_id not in skip)
+    best = heapq.nsmallest(TOP_K, ranked, key=lambda row: (-row[0], row[1]))
+    return [(author_id, score) for score, author_id in best if score > 0]
+
+
+def score_python(graph, users):
+    """{пользователь: [(автор, оценка)]} словарями, без NumPy."""
+    followers = defaultdict(list)
+    for user_id, authors in graph.items():
+        for author_id in authors:
+            followers[author_id].append(user_id)
+    weight = {author_id: 1 / math.sqrt(len(users_))
+              for author_id, users_ in followers.items()}
+    results = {}
+    for user_id in users:
+        followed = graph[user_id]
+        if not followed:
+            results[user_id] = []
+            continue
+        scores = defaultdict(float)
+        for author_id in followed:
+            for candidate in graph.get(author_id, ()):
+                scores[candidate] += 1
+            # Со-подписчики автора и все, на кого они подписаны.
+            for reader in followers[author_id]:
+                for candidate in graph[reader]:
+                    scores[candidate] += weight[author_id] * weight[candidate]
+        results[user_id] = _top(user_id, followed, scores.items())
+    return results
+
+
+def score_sparse(graph, users):
+    """То же, что score_python, произведениями матриц CSR."""
+    ids = numpy.fromiter(graph, dtype=numpy.int64, count=len(graph))
+    index = {pk: i for i, pk in enumerate(ids.tolist())}
+    rows = numpy.repeat(numpy.arange(len(ids)),
+                        [len(graph[pk]) for pk in ids.tolist()])
+    cols = numpy.fromiter((index[author_id] for authors in graph.values()
+                           for author_id in authors),
+                          dtype=numpy.int64, count=len(rows))
+    follows_ = sparse.csr_matrix(
+        (numpy.ones(len(rows)), (rows, cols)), shape=(len(ids), len(ids)))
+    readers = numpy.asarray(follows_.sum(axis=0)).ravel()
+    weight = sparse.diags(numpy.divide(
+        1, numpy.sqrt(readers), out=numpy.zeros_like(readers),
+        where=readers > 0))
+    transposed = follows_.T.tocsr()
+
+    results = {}
+    for start in range(0, len(users), BATCH_SIZE):
+        batch = users[start:start + BATCH_SIZE]
+        chunk = follows_[[index[pk] for pk in batch]]
+        scores = (chunk @ follows_
+                  + chunk @ weight @ transposed @ follows_ @ weight).tocsr()
+        for row, user_id in enumerate(batch):
+            followed = graph[user_id]
+            if not followed:
+                results[user_id] = []
+                continue
+            span = slice(scores.indptr[row], scores.indptr[row + 1])
+            results[user_id] = _top(user_id, followed, zip(
+                ids[scores.indices[span]].tolist(),
+                scores.data[span].tolist()))
+    return results
+
+
+def save(graph, results):
+    users = list(results)
+    for start in range(0, len(users), BATCH_SIZE):
+        batch = users[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            Suggestion.objects.filter(user__in=batch).delete()
+            Suggestion.objects.bulk_create(
+                Suggestion(user_id=user_id, author_id=author_id, score=score)
+                for user_id in batch
+                for author_id, score in results[user_id])
+            SuggestionState.objects.filter(user__in=batch).delete()
+            SuggestionState.objects.bulk_create(
+                SuggestionState(user_id=user_id,
+                                fingerprint=fingerprint(graph[user_id]))
+                for user_id in batch)
+        # Страницы этих пользователей должны показать новые рекомендации.
+        touch(*(f'user:{user_id}' for user_id in batch))
+
+
+def recompute(full=False, engine=None, log=None):
+    """
+    Пересчитывает рекомендации (всех при full, иначе только тех, чьи
+    подписки изменились). engine -- 'sparse' или 'python', по умолчанию
+    sparse, если есть SciPy. Возвращает (пользователей, рекомендаций).
+    """
+    log = log or (lambda message: None)
+    engine = engine or ('sparse' if sparse is not None else 'python')
+    if engine == 'sparse' and sparse is None:
+        raise ImportError('Для расчёта матрицами нужны numpy и scipy')
+    graph = load_graph()
+    users = list(graph) if full else changed_users(graph)
+    log(f'Пользователей: {len(graph)}, к пересчёту: {len(users)} ({engine})')
+    score = score_sparse if engine == 'sparse' else score_python
+    results = score(graph, users)
+    save(graph, results)
+    return len(users), sum(len(rows) for rows in results.values())
+
+
+def for_user(user, exclude=()):
+    """Авторы для виджета: один запрос к Suggestion."""
+    if not user.is_authenticated:
+        return []
+    rows = (Suggestion.objects.filter(user=user).select_related('author')
+            .order_by('-score', 'author'))
+    followed = follows.follow_set(user.pk)
+    return [row.author for row in rows
+            if row.author_id not in followed
+            and row.author_id not in exclude][:WIDGET_SIZE]
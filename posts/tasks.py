@@ -0,0 +1,53 @@
+"""
+Фоновые задачи, которые ставят сигналы моделей (см. posts/jobs.py).
+
+Задачи получают только первичные ключи и перечитывают объекты сами:
+к моменту запуска объект мог измениться или исчезнуть. Каждая задача
+переживает повторный запуск: раскладка и дозаполнение ленты пишут через
+ignore_conflicts, индексация заменяет документ целиком, превью
+перезаписываются.
+"""
+from . import search, thumbnails, timeline
+from .conditional import touch
+from .jobs import task
+from .models import Comment, Follow, Group, Post
+
+SEARCH_MODELS = {kind: model for model, kind in search.KINDS.items()}
+
+
+@task('timeline.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    if post is not None:
+        timeline.fan_out(post)
+        touch('posts')
+
+
+@task('timeline.backfill')
+def backfill(user_id, author_id):
+    # Пока задача ждала, пользователь мог уже отписаться.
+    if Follow.objects.filter(user=user_id, author=author_id).exists():
+        timeline.backfill(user_id, author_id)
+        touch(f'user:{user_id}')
+
+
+@task('search.index')
+def index(kind, object_id):
+    model = SEARCH_MODELS[kind]
+    if model is Post:
+        objects = Post.objects.select_related('author')
+    elif model is Comment:
+        objects = Comment.objects.select_related('author', 'post__author')
+    else:
+        objects = Group.objects.all()
+    obj = objects.filter(pk=object_id).first()
+    if obj is None:
+        search.remove_object(model(pk=object_id))
+    else:
+        search.index_object(obj)
+
+
+@task('thumbnails.generate')
+def generate_thumbnails(post_id):
+    if thumbnails.generate(post_id) is not None:
+        touch('posts')
@@ -0,0 +1,33 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+_inlined = {}
+
+
+def _read(path):
+    # Собранный файл из STATIC_ROOT, а без сборки (runserver, тесты) --
+    # исходник из каталога static приложения.
+    try:
+        with staticfiles_storage.open(staticfiles_storage.stored_name(path)) \
+                as file:
+            return file.read().decode()
+    except (FileNotFoundError, ValueError):
+        pass
+    found = finders.find(path)
+    if found is None:
+        raise ValueError(f'Статический файл {path} не найден')
+    with open(found, encoding='utf-8') as file:
+        return file.read()
+
+
+@register.simple_tag
+def inline_static(path):
+    """<style> с содержимым статического CSS, читается раз на процесс."""
+    if settings.DEBUG or path not in _inlined:
+        _inlined[path] = mark_safe(f'<style>{_read(path)}</style>')
+    return _inlined[path]
@@ -0,0 +1,22 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_url(context, name, *args):
+    """
+    {% url %} для карточек постов: ответ reverse() запоминается на время
+    запроса, и одинаковые ссылки ленты (профиль автора, сообщество)
+    строятся один раз. Без request в контексте -- обычный reverse().
+    """
+    request = context.get('request')
+    if request is None:
+        return reverse(name, args=args)
+    memo = request.__dict__.setdefault('reversed_urls', {})
+    key = (name, *args)
+    url = memo.get(key)
+    if url is None:
+        url = memo[key] = reverse(name, args=args)
+    return url
@@ -0,0 +1,69 @@
+from django.test import TestCase
+
+from posts import benchmark, datagen
+from posts.models import Comment, Follow, Post, TimelineEntry, UserCounters
+
+
+class DatagenTests(TestCase):
+    def test_generate_keeps_ratios_and_derived_data(self):
+        """Генератор создаёт данные в нужных пропорциях и всё пересчитывает."""
+        created = datagen.generate(400, seed=1)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(created['users'], 20)
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            UserCounters.objects.filter(post_count__gt=0).count(),
+            Post.objects.values('author').distinct().count())
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            sum(Post.objects.filter(author=author).count()
+                for author in Follow.objects.values_list('author',
+                                                         flat=True)))
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+
+    def test_generate_is_incremental(self):
+        datagen.generate(100, seed=1)
+        datagen.generate(100, seed=2)
+        self.assertEqual(Post.objects.count(), 200)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datagen.generate(200, seed=3)
+
+    def test_run_reports_every_endpoint(self):
+        """Замер возвращает перцентили, запросы и память по каждой странице."""
+        results = benchmark.run(requests=3, warmup=1)
+        self.assertEqual(
+            {row['endpoint'] for row in results}, set(benchmark.ENDPOINTS))
+        for row in results:
+            self.assertEqual(row['posts'], 200)
+            self.assertGreater(row['queries'], 0)
+            self.assertGreater(row['memory_peak_kib'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+            self.assertLessEqual(row['ttfb_p50_ms'], row['p50_ms'])
+
+    def test_streamed_pages_measured_both_ways(self):
+        """Ленты меряются и обычным render(), и потоком, с теми же запросами."""
+        render, stream = benchmark.run(['group_posts'], requests=3, warmup=1)
+        self.assertEqual((render['streaming'], stream['streaming']),
+                         (False, True))
+        self.assertEqual(render['queries'], stream['queries'])
+
+    def test_compare_reports_query_regressions(self):
+        baseline = [{'posts': 200, 'endpoint': 'index', 'queries': 3},
+                    {'posts': 200, 'endpoint': 'profile', 'queries': 5}]
+        results = [{'posts': 200, 'endpoint': 'index', 'queries': 4},
+                   {'posts': 200, 'endpoint': 'profile', 'queries': 5},
+                   {'posts': 1000, 'endpoint': 'index', 'queries': 9}]
+        self.assertEqual(len(benchmark.compare(results, baseline)), 1)
+        self.assertEqual(benchmark.compare(results, baseline, tolerance=1), [])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
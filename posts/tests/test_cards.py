@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(STREAM_PAGES=False, QUERY_BUDGET_STRICT=True)
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Сообщество', slug='group',
+                                         description='Описание')
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(12)
+        )
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_one_get_many_per_page(self):
+        """Карточки страницы читаются из кэша одним get_many."""
+        self.guest_client.get(reverse('index'))
+        with mock.patch.object(cards.cache, 'get_many',
+                               wraps=cards.cache.get_many) as get_many, \
+                mock.patch.object(cards, 'render_to_string') as render:
+            self.guest_client.get(reverse('index'))
+        card_calls = [call for call in get_many.call_args_list
+                      if any(key.startswith('post_card')
+                             for key in call[0][0])]
+        self.assertEqual(len(card_calls), 1)
+        render.assert_not_called()
+
+    def test_cards_are_shared_between_feeds(self):
+        """Карточка, отрисованная для главной, используется в ленте группы."""
+        self.guest_client.get(reverse('index'))
+        with mock.patch.object(cards, 'render_to_string') as render:
+            self.guest_client.get(reverse('group', args=[self.group.slug]))
+            self.guest_client.get(reverse('profile',
+                                          args=[self.author.username]))
+        render.assert_not_called()
+
+    def test_edit_button_is_not_cached(self):
+        """Кнопка «Редактировать» видна только автору и не попадает в кэш."""
+        self.author_client.get(reverse('index'))
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, 'Редактировать')
+        response = self.author_client.get(reverse('index'))
+        self.assertContains(response, 'Редактировать')
+
+    def test_comment_and_group_change_invalidate_card(self):
+        """Новый комментарий и переименование группы обновляют карточку."""
+        self.guest_client.get(reverse('index'))
+        Comment.objects.create(post=self.post, author=self.author, text='Да')
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, '#Новое название')
+
+    def test_card_links_reversed_once_per_request(self):
+        """Ссылки на автора и сообщество строятся один раз на страницу."""
+        from posts.templatetags import urls
+        with mock.patch.object(urls, 'reverse', wraps=urls.reverse) as rev:
+            response = self.author_client.get(reverse('index'))
+        names = [call[0][0] for call in rev.call_args_list]
+        self.assertEqual(names.count('profile'), 1)
+        self.assertEqual(names.count('group'), 1)
+        self.assertEqual(names.count('post'), 10)
+        self.assertContains(
+            response, reverse('post_edit', args=['author', self.post.id]))
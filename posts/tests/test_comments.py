@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.paginator import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        readers = [User.objects.create_user(username=f'reader{i}')
+                   for i in range(3)]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=readers[i % 3], text=f'Ответ {i}')
+            for i in range(COMMENTS_PER_PAGE + 5))
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_post_page_renders_first_page_inline(self):
+        """На странице поста -- только первая страница комментариев."""
+        response = self.client.get(
+            reverse('post', args=['author', self.post.id]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Ответ 0')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'more-comments')
+
+    def test_fragment_endpoint_returns_next_page(self):
+        """Следующие комментарии отдаются фрагментом с курсором."""
+        page = self.client.get(
+            reverse('post', args=['author', self.post.id])).context['comments']
+        response = self.client.get(
+            reverse('post_comments', args=['author', self.post.id]),
+            {'after': page.next_cursor})
+        data = response.json()
+        self.assertEqual(data['next'], '')
+        self.assertEqual(data['html'].count('media card'), 5)
+        self.assertIn(f'Ответ {COMMENTS_PER_PAGE + 4}', data['html'])
+
+    def test_fragment_endpoint_checks_author(self):
+        response = self.client.get(
+            reverse('post_comments', args=['reader0', self.post.id]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+# В тестах один процесс, и LocMemCache для него общий.
+@override_settings(CACHE_SHARED=True, QUERY_BUDGET_STRICT=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_answer_304(self):
+        """Без изменений ленты и пост отвечают 304 без отрисовки."""
+        urls = [reverse('index'), reverse('profile', args=['author']),
+                reverse('post', args=['author', self.post.id])]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Last-Modified', response)
+        response = self.revalidate(self.reader_client, reverse('follow_index'))
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_feed_etag(self):
+        url = reverse('index')
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('post', args=['author', self.post.id])
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_follow_feed_etag(self):
+        """Подписка меняет версию набора подписок и ленту подписок."""
+        url = reverse('follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_off_without_shared_cache(self):
+        """С кэшем в каждом процессе валидаторы не ставятся."""
+        response = self.guest_client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_cache_headers_depend_on_login(self):
+        """Анонимам public, залогиненным private, всем Vary: Cookie."""
+        url = reverse('index')
+        guest = self.guest_client.get(url)
+        reader = self.reader_client.get(url)
+        self.assertIn('public', guest['Cache-Control'])
+        self.assertIn('private', reader['Cache-Control'])
+        self.assertNotEqual(guest['ETag'], reader['ETag'])
+        for response in (guest, reader):
+            self.assertIn('Cookie', response['Vary'])
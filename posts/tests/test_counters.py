@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_views_update_counters(self):
+        """Комментарий, подписка и отписка меняют счётчики."""
+        self.client.post(
+            reverse('add_comment', args=[self.author.username, self.post.id]),
+            data={'text': 'Комментарий'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.client.get(reverse('profile_follow', args=[self.author.username]))
+        self.assertEqual(self.counters(self.author).follower_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.client.get(reverse('profile_unfollow', args=[self.author.username]))
+        self.assertEqual(self.counters(self.author).follower_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_new_post_and_bulk_create_count_posts(self):
+        """Посты, созданные по одному и пачкой, учитываются в счётчике."""
+        self.client.post(reverse('new_post'), data={'text': 'Новый'})
+        Post.objects.bulk_create(
+            Post(text=str(i), author=self.reader) for i in range(3))
+        self.assertEqual(self.counters(self.reader).post_count, 4)
+
+    def test_deletes_never_go_negative(self):
+        """Удаление при обнулённом счётчике не ломает запрос."""
+        comment = Comment.objects.create(post=self.post, author=self.reader,
+                                         text='Комментарий')
+        Post.objects.filter(pk=self.post.pk).update(comment_count=0)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        """Команда rebuild_counters восстанавливает разошедшиеся счётчики."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        UserCounters.objects.update(post_count=42, follower_count=42,
+                                    following_count=42)
+        UserCounters.objects.filter(user=self.reader).delete()
+        Post.objects.update(comment_count=42)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        author = self.counters(self.author)
+        reader = self.counters(self.reader)
+        self.assertEqual(
+            (author.post_count, author.follower_count, author.following_count),
+            (1, 1, 0))
+        self.assertEqual(
+            (reader.post_count, reader.follower_count, reader.following_count),
+            (0, 0, 1))
+
+    def test_post_page_reads_counters(self):
+        """Карточки и страница поста не считают строки на каждую отрисовку."""
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        response = self.client.get(
+            reverse('post', args=[self.author.username, self.post.id]))
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertEqual(response.context['post_count'], 1)
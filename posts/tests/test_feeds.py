@@ -0,0 +1,115 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blogging.queries import assert_queries
+from posts.models import Group, Post
+
+User = get_user_model()
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@override_settings(CACHE_SHARED=True, QUERY_BUDGET_STRICT=True)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(title='Кошки & собаки',
+                                         slug='cats', description='Про котов')
+        cls.post = Post.objects.create(text='Первый <b>пост</b>\nи строка',
+                                       author=cls.author, group=cls.group)
+        cls.other = Post.objects.create(text='Вне сообщества',
+                                        author=User.objects.create_user(
+                                            username='other'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def fetch(self, name, *args, **extra):
+        response = self.client.get(reverse(name, args=args), **extra)
+        response.body = (b''.join(response.streaming_content)
+                         if response.streaming else response.content)
+        return response
+
+    def test_formats(self):
+        """Atom, RSS и JSON Feed разбираются и содержат посты ленты."""
+        atom = self.fetch('group_feed', 'cats', 'atom')
+        self.assertEqual(atom['Content-Type'],
+                         'application/atom+xml; charset=utf-8')
+        root = ElementTree.fromstring(atom.body)
+        self.assertEqual(root.find(f'{ATOM}title').text, 'Кошки & собаки')
+        entries = root.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].find(f'{ATOM}content').text,
+                         'Первый &lt;b&gt;пост&lt;/b&gt;<br>и строка')
+        self.assertEqual(entries[0].find(f'{ATOM}author/{ATOM}name').text,
+                         'Лев')
+
+        rss = ElementTree.fromstring(self.fetch('feed', 'rss').body)
+        self.assertEqual(len(rss.findall('channel/item')), 2)
+
+        feed = json.loads(self.fetch('profile_feed', 'other', 'json').body)
+        self.assertEqual([item['content_html'] for item in feed['items']],
+                         ['Вне сообщества'])
+        self.assertTrue(feed['feed_url'].endswith('/other/feeds/json/'))
+
+    def test_streaming_and_queries(self):
+        """Лента отдаётся потоком, посты читаются одним запросом."""
+        response = self.client.get(reverse('feed', args=['atom']))
+        self.assertTrue(response.streaming)
+        with assert_queries(2):
+            b''.join(response.streaming_content)
+
+    def test_unknown_group(self):
+        self.assertEqual(
+            self.fetch('group_feed', 'nope', 'rss').status_code, 404)
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304 без тела."""
+        etag = self.fetch('feed', 'atom')['ETag']
+        response = self.fetch('feed', 'atom', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b'')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_conditional_get_without_shared_cache(self):
+        """С locmem валидаторы ленты считаются из базы и тоже дают 304."""
+        first = self.fetch('group_feed', 'cats', 'rss')
+        self.assertIn('Last-Modified', first)
+        response = self.fetch('group_feed', 'cats', 'rss',
+                              HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        edited = self.fetch('group_feed', 'cats', 'rss',
+                            HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(edited.status_code, 200)
+        self.post.delete()
+        response = self.fetch('group_feed', 'cats', 'rss',
+                              HTTP_IF_NONE_MATCH=edited['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_until_new_post(self):
+        """Готовая лента берётся из кэша, новый пост её сбрасывает."""
+        first = self.fetch('profile_feed', 'author', 'json').body
+        response = self.client.get(reverse('profile_feed',
+                                           args=['author', 'json']))
+        with assert_queries(0):
+            self.assertEqual(b''.join(response.streaming_content), first)
+
+        Post.objects.create(text='Свежий', author=self.author)
+        items = json.loads(
+            self.fetch('profile_feed', 'author', 'json').body)['items']
+        self.assertEqual(items[0]['content_html'], 'Свежий')
+
+    def test_pages_link_their_feeds(self):
+        response = self.client.get(reverse('group', args=['cats']))
+        self.assertContains(
+            response, f'href="{reverse("group_feed", args=["cats", "rss"])}"')
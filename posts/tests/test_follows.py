@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class FollowSetTests(TestCase):
+    def test_encodings_round_trip(self):
+        """Редкие id хранятся массивом, плотные -- битовой картой."""
+        sparse = follows.FollowSet.from_ids([5, 100000, 42])
+        dense = follows.FollowSet.from_ids(range(1000, 1200, 2))
+        self.assertEqual(sparse.kind, follows.ARRAY)
+        self.assertEqual(dense.kind, follows.BITMAP)
+        self.assertLess(len(dense.to_bytes()), 100 * 4)
+        for original in (sparse, dense, follows.FollowSet.from_ids([])):
+            restored = follows.FollowSet.from_bytes(original.to_bytes())
+            for pk in (0, 5, 42, 43, 999, 1000, 1001, 1198, 1200, 100000):
+                self.assertEqual(pk in restored, pk in original)
+        self.assertIn(1198, dense)
+        self.assertNotIn(1199, dense)
+        self.assertNotIn(6, sparse)
+
+
+@override_settings(CACHE_SHARED=True, QUERY_BUDGET_STRICT=True)
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(5)]
+        Post.objects.create(text='Пост', author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не создаёт строку и не двигает счётчики."""
+        author = self.authors[0]
+        self.assertTrue(follows.follow(self.reader.pk, author.pk))
+        self.assertFalse(follows.follow(self.reader.pk, author.pk))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(UserCounters.objects.get(
+            user=author).follower_count, 1)
+        self.assertEqual(UserCounters.objects.get(
+            user=self.reader).following_count, 1)
+        self.assertEqual(self.reader.timeline.count(), 1)
+
+    def test_page_of_authors_from_cache(self):
+        """Страница авторов проверяется по кэшу, без запросов к базе."""
+        ids = [author.pk for author in self.authors]
+        follows.follow(self.reader.pk, ids[1])
+        Follow.objects.create(user=self.reader, author=self.authors[3])
+        self.assertEqual(follows.following(self.reader, ids),
+                         {ids[1], ids[3]})
+        with self.assertNumQueries(0):
+            self.assertEqual(follows.following(self.reader, ids),
+                             {ids[1], ids[3]})
+        Follow.objects.filter(author=self.authors[1]).delete()
+        self.assertEqual(follows.following(self.reader, ids), {ids[3]})
+        self.assertEqual(follows.following(AnonymousUser(), ids), set())
+
+    @override_settings(CACHE_SHARED=False)
+    def test_read_from_database_without_shared_cache(self):
+        """Без общего кэша набор читается из базы при каждой проверке."""
+        ids = [author.pk for author in self.authors]
+        follows.following(self.reader, ids)
+        # Подписка из другого воркера: отметка здесь не сдвинулась.
+        Follow.objects.bulk_create([Follow(user=self.reader,
+                                           author=self.authors[2])])
+        with self.assertNumQueries(1):
+            self.assertEqual(follows.following(self.reader, ids), {ids[2]})
+
+    @override_settings(CACHE_SHARED=False)
+    def test_single_author_checked_by_exists(self):
+        """Без общего кэша is_following не читает все подписки."""
+        Follow.objects.bulk_create([Follow(user=self.reader, author=author)
+                                    for author in self.authors[:3]])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(follows.is_following(self.reader,
+                                                 self.authors[1].pk))
+            self.assertFalse(follows.is_following(self.reader,
+                                                  self.authors[4].pk))
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertIn('LIMIT 1', query['sql'])
+        with self.assertNumQueries(0):
+            self.assertFalse(follows.is_following(AnonymousUser(),
+                                                  self.authors[1].pk))
+
+    def test_follow_view(self):
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('profile_follow', args=['author2'])
+        client.get(url)
+        client.get(url)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        response = client.get(reverse('profile', args=['author2']))
+        self.assertTrue(response.context['following'])
+        client.get(reverse('profile_unfollow', args=['author2']))
+        response = client.get(reverse('profile', args=['author2']))
+        self.assertFalse(response.context['following'])
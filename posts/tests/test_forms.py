@@ -13,7 +13,7 @@ from posts.models import Comment, Post
 MEDIA_ROOT = tempfile.mkdtemp()
 
 
-@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGET_STRICT=True)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
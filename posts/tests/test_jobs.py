@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import jobs
+from posts.models import Follow, Job, Post, SearchDocument, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=False, QUERY_BUDGET_STRICT=True)
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Job.objects.all().delete()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.calls = []
+        jobs.TASKS['test.flaky'] = self.flaky
+
+    def tearDown(self):
+        del jobs.TASKS['test.flaky']
+
+    def flaky(self, value):
+        self.calls.append(value)
+        raise ValueError('не вышло')
+
+    def test_new_post_defers_side_effects(self):
+        """Новый пост ставит задачи, а ленты и индекс заполняет воркер."""
+        self.client.post(reverse('new_post'), data={'text': 'Отложенный'})
+        post = Post.objects.get(text='Отложенный')
+        self.assertEqual(
+            set(Job.objects.values_list('name', flat=True)),
+            {'timeline.fan_out', 'search.index'})
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertFalse(Job.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertTrue(SearchDocument.objects.filter(
+            kind='post', object_id=post.pk).exists())
+
+    def test_idempotency_key(self):
+        """Пока задача ждёт в очереди, такая же не добавляется."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        for text in ('Правка', 'Ещё правка'):
+            post.text = text
+            post.save()
+        self.assertEqual(Job.objects.filter(name='search.index').count(), 1)
+        jobs.run_pending()
+        self.assertEqual(
+            SearchDocument.objects.get(kind='post', object_id=post.pk).text,
+            'Ещё правка')
+
+    def test_retry_with_backoff_then_fail(self):
+        """Упавшая задача откладывается всё дальше, потом помечается failed."""
+        jobs.enqueue('test.flaky', 1)
+        delays = []
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+            job = Job.objects.get()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('ValueError', job.last_error)
+            if attempt < jobs.MAX_ATTEMPTS:
+                self.assertEqual(job.status, Job.QUEUED)
+                delays.append(job.run_at - timezone.now())
+                # Не ждём паузу, а сдвигаем задачу в прошлое.
+                Job.objects.update(run_at=timezone.now())
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(self.calls, [1] * jobs.MAX_ATTEMPTS)
+        self.assertEqual(delays, sorted(delays))
+        self.assertEqual(jobs.run_pending(), (0, 0))
+
+    def test_stale_running_job_is_reclaimed(self):
+        """Задачу упавшего воркера подбирает следующий."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Job.objects.update(
+            status=Job.RUNNING, attempts=1,
+            locked_at=timezone.now() - timedelta(seconds=jobs.TIMEOUT + 1))
+        with mock.patch.object(jobs, 'claim', wraps=jobs.claim) as claim:
+            self.assertEqual(jobs.run_pending(), (2, 0))
+        self.assertEqual(claim.call_count, 3)
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_claimed_job_is_not_taken_twice(self):
+        """Задачу, которую уже взял другой воркер, не берут второй раз."""
+        jobs.enqueue('test.flaky', 1)
+        self.assertIsNotNone(jobs.claim())
+        self.assertIsNone(jobs.claim())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_failure_propagates(self):
+        """В запросе упавшая задача не теряется: исключение летит дальше."""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.flaky', 1)
+        with override_settings(JOBS_EAGER_PROPAGATE=False), \
+                self.assertLogs('posts.jobs', 'ERROR'):
+            jobs.enqueue('test.flaky', 2)
+        self.assertEqual(self.calls, [1, 2])
+        self.assertFalse(Job.objects.filter(name='test.flaky').exists())
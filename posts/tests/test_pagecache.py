@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE=True, CACHE_SHARED=True,
+                   QUERY_BUDGET_STRICT=True)
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_second_anonymous_hit_skips_the_view(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов к базе."""
+        url = reverse('post', args=['author', self.post.id])
+        first = self.guest_client.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertIn('s-maxage=60', second['Cache-Control'])
+        self.assertIn('stale-while-revalidate=300', second['Cache-Control'])
+
+    def test_cached_page_answers_304(self):
+        url = reverse('index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_content_signals_invalidate_pages(self):
+        """Пост, комментарий и подписка сбрасывают кэш страниц."""
+        url = reverse('profile', args=['author'])
+        changes = [
+            lambda: Post.objects.create(text='Новый пост', author=self.author),
+            lambda: Comment.objects.create(post=self.post, author=self.reader,
+                                           text='Комментарий'),
+            lambda: Follow.objects.create(user=self.reader,
+                                          author=self.author),
+        ]
+        for change in changes:
+            self.guest_client.get(url)
+            change()
+            self.assertEqual(self.guest_client.get(url)['X-Page-Cache'],
+                             'miss')
+
+    def test_logged_in_users_and_posts_skip_cache(self):
+        client = Client()
+        client.force_login(self.reader)
+        client.get(reverse('index'))
+        response = client.get(reverse('index'))
+        self.assertNotIn('X-Page-Cache', response)
+        response = client.post(reverse('add_comment',
+                                       args=['author', self.post.id]),
+                               {'text': 'Текст'})
+        self.assertNotIn('X-Page-Cache', response)
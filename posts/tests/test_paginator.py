@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, FloatField, Value
+from django.test import TestCase
+
+from posts.models import Post
+from posts.paginator import CursorPaginator, decode_cursor, encode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = get_user_model().objects.create_user(username='DJ')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(25)
+        )
+        cls.post_list = Post.objects.all()
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def test_pages_cover_all_posts_in_order(self):
+        """Переход по курсору next обходит все посты без пропусков и повторов."""
+        paginator = CursorPaginator(self.post_list, 10)
+        page = paginator.get_page()
+        seen = list(page)
+        self.assertFalse(page.has_previous())
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(page), 5)
+
+    def test_previous_cursor_returns_to_previous_page(self):
+        """Курсор previous возвращает на предыдущую страницу."""
+        paginator = CursorPaginator(self.post_list, 10)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_page_does_not_count_rows(self):
+        """Страница читается одним запросом без COUNT(*)."""
+        paginator = CursorPaginator(self.post_list, 10)
+        with self.assertNumQueries(1):
+            page = paginator.get_page()
+        cursor = page.next_cursor
+        with self.assertNumQueries(1):
+            paginator.get_page(after=cursor)
+
+    def test_broken_cursor_gives_first_page(self):
+        """Испорченный курсор не ломает страницу, а даёт первую."""
+        paginator = CursorPaginator(self.post_list, 10)
+        page = paginator.get_page(after='мусор')
+        self.assertEqual(list(page), self.expected[:10])
+        self.assertIsNone(decode_cursor('bm90LWEtY3Vyc29y'))
+
+    def test_cursor_of_other_kind_gives_first_page(self):
+        """Курсор-число для ленты по дате (и наоборот) даёт первую страницу."""
+        post = self.expected[0]
+        number = encode_cursor((1.5, post.id))
+        date = encode_cursor((post.pub_date, post.id))
+        paginator = CursorPaginator(self.post_list, 10)
+        self.assertEqual(list(paginator.get_page(after=number)),
+                         self.expected[:10])
+        self.assertEqual(list(paginator.stream_page(before=number)),
+                         self.expected[:10])
+        scored = self.post_list.annotate(
+            score=Value(1.0, output_field=FloatField()))
+        paginator = CursorPaginator(scored, 10, ordering=('-score', '-id'))
+        self.assertEqual(list(paginator.get_page(after=date)),
+                         self.expected[:10])
+        feed = self.post_list.annotate(feed_pub_date=F('pub_date'))
+        paginator = CursorPaginator(feed, 10, ordering=('-feed_pub_date',
+                                                        '-id'))
+        self.assertEqual(paginator.cursor_kind, 'd')
+
+    def test_cursor_is_opaque_roundtrip(self):
+        """Курсор кодирует пару (pub_date, id) и декодируется обратно."""
+        post = self.expected[0]
+        token = encode_cursor((post.pub_date, post.id))
+        self.assertNotIn('|', token)
+        self.assertEqual(decode_cursor(token), (post.pub_date, post.id))
+
+    def test_merged_sources(self):
+        """Несколько querysets сливаются в одну упорядоченную ленту."""
+        even = Post.objects.filter(id__in=[p.id for p in self.expected[::2]])
+        odd = Post.objects.filter(id__in=[p.id for p in self.expected[1::2]])
+        paginator = CursorPaginator([even, odd, even], 10)
+        page = paginator.get_page()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.expected)
+
+    def test_streamed_page_matches_page(self):
+        """Потоковая страница даёт те же строки и курсоры, что get_page."""
+        even = Post.objects.filter(id__in=[p.id for p in self.expected[::2]])
+        for sources in (self.post_list, [even, self.post_list]):
+            paginator = CursorPaginator(sources, 10)
+            page, after = None, None
+            while page is None or page.has_next():
+                page = paginator.get_page(after=after)
+                streamed = paginator.stream_page(after=after, chunk_size=3)
+                self.assertEqual(list(streamed), list(page))
+                self.assertEqual(list(streamed), list(page))
+                self.assertEqual(streamed.next_cursor, page.next_cursor)
+                self.assertEqual(streamed.previous_cursor,
+                                 page.previous_cursor)
+                after = page.next_cursor
@@ -0,0 +1,84 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import datagen, search
+from posts.models import Follow, Post, User
+
+# Строка плана SQLite без индекса: «SCAN posts_post» (в старых версиях
+# «SCAN TABLE posts_post»). «SCAN ... USING INDEX» -- проход по индексу
+# в нужном порядке с LIMIT, он допустим.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'планы запросов SQLite')
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datagen.generate(300, seed=5)
+        search.reindex()
+        cls.post = (Post.objects.filter(group__isnull=False)
+                    .select_related('author', 'group').first())
+        cls.reader = Follow.objects.first().user
+        cls.stranger = User.objects.exclude(
+            pk=cls.post.author_id).exclude(
+            follower__author=cls.post.author_id).first()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def assert_indexed(self, method, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for line in self.plan(query['sql']):
+                self.assertIsNone(FULL_SCAN.match(line),
+                                  f'{url}: {line}\n{query["sql"]}')
+        return response
+
+    def test_pages_use_indexes(self):
+        """Ни один запрос страниц и лент не читает таблицу целиком."""
+        author = self.post.author.username
+        urls = [
+            reverse('index'),
+            reverse('group', args=[self.post.group.slug]),
+            reverse('profile', args=[author]),
+            reverse('post', args=[author, self.post.id]),
+            reverse('post_comments', args=[author, self.post.id]),
+            reverse('follow_index'),
+            reverse('search') + '?q=кот',
+            reverse('feed', args=['atom']),
+            reverse('group_feed', args=[self.post.group.slug, 'rss']),
+            reverse('profile_feed', args=[author, 'json']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assert_indexed('get', url)
+                page = response.context and response.context.get('page')
+                if page and page.has_next():
+                    self.assert_indexed('get',
+                                        f'{url}?after={page.next_cursor}')
+
+    def test_follow_uses_indexes(self):
+        """Подписка и отписка ищут Follow по индексам в обе стороны."""
+        self.client.force_login(self.stranger)
+        author = self.post.author.username
+        self.assert_indexed('get', reverse('profile_follow', args=[author]))
+        self.assert_indexed('get', reverse('profile_unfollow', args=[author]))
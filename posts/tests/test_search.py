@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Group, Post, SearchDocument
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        forms = {
+            'сообщество': ['сообщества', 'сообществом', 'сообществе'],
+            'книга': ['книги', 'книгой', 'книгах'],
+            'красивый': ['красивая', 'красивыми'],
+        }
+        for word, others in forms.items():
+            for other in others:
+                with self.subTest(word=other):
+                    self.assertEqual(stem(other), stem(word))
+        self.assertEqual(stem('важнейшими'), 'важн')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Любители котов', slug='cats',
+            description='Сообщество для тех, кто держит кошек')
+        cls.cat_post = Post.objects.create(
+            text='Мой кот спит весь день, а котёнок играет',
+            author=cls.author, group=cls.group)
+        cls.dog_post = Post.objects.create(
+            text='Собака гуляет во дворе', author=cls.author)
+        cls.comment = Comment.objects.create(
+            post=cls.dog_post, author=cls.author,
+            text='Собаки и коты отлично ладят')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return [(document.kind, document.object_id)
+                for document in response.context['page']]
+
+    def test_finds_posts_comments_and_groups(self):
+        """Поиск с учётом словоформ находит посты, комментарии и группы."""
+        found = self.found('коты')
+        self.assertIn(('post', self.cat_post.id), found)
+        self.assertIn(('comment', self.comment.id), found)
+        self.assertIn(('group', self.group.id), found)
+        self.assertNotIn(('post', self.dog_post.id), found)
+
+    def test_all_words_must_match_and_rank(self):
+        """Все слова запроса обязательны, точное совпадение выше."""
+        self.assertEqual(self.found('собака двор'),
+                         [('post', self.dog_post.id)])
+        self.assertEqual(self.found('собака кот'),
+                         [('comment', self.comment.id)])
+        self.assertEqual(self.found('несуществующее'), [])
+
+    def test_signals_keep_index_current(self):
+        """Правка и удаление объектов сразу отражаются в индексе."""
+        self.dog_post.text = 'Попугай говорит'
+        self.dog_post.save()
+        self.assertEqual(self.found('попугай'), [('post', self.dog_post.id)])
+        self.assertEqual(self.found('двор'), [])
+        self.comment.delete()
+        self.assertNotIn(('comment', self.comment.id), self.found('кот'))
+
+    def test_highlight(self):
+        """Совпадения подсвечиваются, остальной текст экранируется."""
+        snippet = search.highlight('<b>Коты</b> и кошки', [stem('кот')])
+        self.assertEqual(snippet, '&lt;b&gt;<mark>Коты</mark>&lt;/b&gt; и кошки')
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        self.assertContains(response, '<mark>кот</mark>')
+
+    def test_results_are_keyset_paginated(self):
+        """Результаты листаются курсором без повторов."""
+        Post.objects.bulk_create(
+            Post(text=f'Кот номер {i} ' + 'слово ' * i, author=self.author)
+            for i in range(15))
+        call_command('rebuild_search_index', batch_size=4, stdout=StringIO())
+        results, _ = search.search('кот')
+        expected = list(results.order_by('-score', '-id'))
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        page = response.context['page']
+        seen = list(page)
+        response = self.client.get(reverse('search'),
+                                   {'q': 'кот', 'after': page.next_cursor})
+        seen += list(response.context['page'])
+        self.assertEqual([d.id for d in seen], [d.id for d in expected])
+        self.assertEqual(len(seen), 18)
+
+    def test_document_count_is_kept_between_pages(self):
+        """Следующие страницы считают оценки по числу документов первой."""
+        Post.objects.bulk_create(
+            Post(text=f'Кот номер {i}', author=self.author) for i in range(15))
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        documents = SearchDocument.objects.count()
+        self.assertEqual(response.context['documents'], documents)
+        page = response.context['page']
+        self.assertContains(response, f'n={documents}&amp;after=')
+        # Индекс вырос, а закэшированное число могло истечь.
+        Post.objects.create(text='Про собак', author=self.author)
+        self.assertEqual(SearchDocument.objects.count(), documents + 1)
+        cache.clear()
+        response = self.client.get(reverse('search'), {
+            'q': 'кот', 'n': documents, 'after': page.next_cursor})
+        results, _ = search.search('кот', documents)
+        expected = list(results.order_by('-score', '-id'))
+        self.assertEqual(list(page) + list(response.context['page']),
+                         expected)
+        self.assertEqual([d.score for d in response.context['page']],
+                         [d.score for d in expected[len(page):]])
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс с нуля."""
+        SearchDocument.objects.all().delete()
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(SearchDocument.objects.count(), 4)
+        self.assertIn(('post', self.cat_post.id), self.found('кот'))
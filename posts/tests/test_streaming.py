@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blogging.queries import assert_queries
+from posts.models import Follow, Group, Post
+from posts.paginator import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+@override_settings(STREAM_PAGES=True, QUERY_BUDGET_STRICT=True)
+class StreamingPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Кошки', slug='cats')
+        Post.objects.bulk_create(
+            Post(text=f'Пост номер {i}', author=cls.author, group=cls.group)
+            for i in range(POSTS_PER_PAGE + 3))
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_header_is_sent_before_posts_are_read(self):
+        """Первый кусок -- шапка страницы, посты ещё не читались."""
+        response = self.client.get(reverse('index'))
+        self.assertTrue(response.streaming)
+        chunks = iter(response.streaming_content)
+        with assert_queries(0):
+            head = next(chunks).decode()
+        self.assertIn('Последние обновления на сайте', head)
+        self.assertNotIn('Пост номер', head)
+        with assert_queries(1):
+            body = head + b''.join(chunks).decode()
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+    def test_same_posts_and_cursor_as_render(self):
+        """Поток показывает те же посты и ту же ссылку дальше, что render()."""
+        for url in (reverse('index'), reverse('group', args=['cats']),
+                    reverse('profile', args=['author']),
+                    reverse('follow_index')):
+            with self.subTest(url=url):
+                with override_settings(STREAM_PAGES=False):
+                    rendered = self.client.get(url)
+                page = rendered.context['page']
+                self.assertEqual(len(page), POSTS_PER_PAGE)
+                streamed = b''.join(
+                    self.client.get(url).streaming_content).decode()
+                for post in page:
+                    self.assertIn(post.text, streamed)
+                self.assertEqual(streamed.count('Пост номер'),
+                                 POSTS_PER_PAGE)
+                self.assertIn(f'after={page.next_cursor}', streamed)
+
+                second = b''.join(self.client.get(
+                    f'{url}?after={page.next_cursor}').streaming_content)
+                self.assertEqual(second.decode().count('Пост номер'), 3)
+
+    @override_settings(PAGE_CACHE=True)
+    def test_anonymous_pages_are_cached_whole(self):
+        guest = Client()
+        first = guest.get(reverse('index'))
+        self.assertFalse(first.streaming)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        second = guest.get(reverse('index'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
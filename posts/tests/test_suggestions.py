@@ -0,0 +1,77 @@
+import math
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Suggestion
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in ('reader', 'a', 'b', 'x', 'y', 'z')}
+        for user, author in (('reader', 'a'), ('reader', 'b'), ('a', 'x'),
+                             ('b', 'x'), ('b', 'y'), ('z', 'a'), ('z', 'y')):
+            Follow.objects.create(user=cls.users[user],
+                                  author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return [(row.author.username, row.score)
+                for row in Suggestion.objects.filter(
+                    user=self.users[name]).order_by('-score', 'author')]
+
+    def test_friends_of_friends_and_co_follow(self):
+        """
+        x читают оба автора reader, y -- один из них и со-подписчик z:
+        (2 + 0) / 2 и (1 + 1/√2 · 1/√2) / 2.
+        """
+        suggestions.recompute(engine='python')
+        self.assertEqual(self.suggested('reader'), [('x', 1.0), ('y', 0.75)])
+        self.assertEqual(self.suggested('x'), [])
+
+    @skipIf(suggestions.sparse is None, 'нужны numpy и scipy')
+    def test_sparse_matches_python(self):
+        graph = suggestions.load_graph()
+        self.assertEqual(suggestions.score_sparse(graph, list(graph)),
+                         suggestions.score_python(graph, list(graph)))
+
+    def test_only_changed_users_recomputed(self):
+        """Повторный расчёт берёт только тех, чьи подписки изменились."""
+        self.assertEqual(suggestions.recompute(engine='python')[0],
+                         len(self.users))
+        self.assertEqual(suggestions.recompute(engine='python')[0], 0)
+        Follow.objects.create(user=self.users['reader'],
+                              author=self.users['x'])
+        self.assertEqual(suggestions.recompute(engine='python')[0], 1)
+        self.assertEqual(self.suggested('reader'),
+                         [('y', round((1 + 0.5 + 1 / math.sqrt(6)) / 3, 6))])
+        self.assertEqual(suggestions.recompute(full=True,
+                                               engine='python')[0],
+                         len(self.users))
+
+    def test_profile_widget(self):
+        """Профиль показывает рекомендации, кроме уже прочитанных."""
+        suggestions.recompute(engine='python')
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(reverse('profile', args=['a']))
+        self.assertEqual(response.context['suggestions'],
+                         [self.users['x'], self.users['y']])
+        self.assertContains(response, 'Кого почитать')
+
+        client.get(reverse('profile_follow', args=['x']))
+        response = client.get(reverse('profile', args=['y']))
+        self.assertEqual(response.context['suggestions'], [])
+        self.assertNotContains(response, 'Кого почитать')
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Job, Post
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, STREAM_PAGES=False,
+                   QUERY_BUDGET_STRICT=True)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='DJ')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name='photo.png'):
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(),
+                                  content_type='image/png')
+
+    def test_thumbnails_generated_on_save(self):
+        """При сохранении формы нарезаются все ширины в JPEG и WebP."""
+        self.client.post(reverse('new_post'),
+                         data={'text': 'С картинкой', 'image': self.upload()})
+        post = Post.objects.get(text='С картинкой')
+        manifest = post.thumbnail_manifest
+        self.assertEqual(manifest['source'], post.image.name)
+        for fmt in ('jpeg', 'webp'):
+            self.assertEqual([width for width, _ in manifest[fmt]],
+                             list(thumbnails.WIDTHS))
+            for width, path in manifest[fmt]:
+                with Image.open(os.path.join(MEDIA_ROOT, path)) as image:
+                    self.assertEqual(image.format, fmt.upper())
+                    self.assertEqual(image.width, width)
+
+    def test_regenerated_thumbnails_get_new_names(self):
+        """Другие байты превью -- другое имя, старые файлы удаляются."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.upload())
+        post.refresh_from_db()
+        old = [path for _, path in post.thumbnail_manifest['jpeg']]
+        self.assertRegex(old[0], r'-480-[0-9a-f]{20}\.jpg$')
+        self.assertEqual(thumbnails.generate(post.pk)['jpeg'],
+                         post.thumbnail_manifest['jpeg'])
+        with mock.patch.object(thumbnails, 'QUALITY', 50):
+            manifest = thumbnails.generate(post.pk)
+        new = [path for _, path in manifest['jpeg']]
+        self.assertFalse(set(old) & set(new))
+        for path in old:
+            self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, path)))
+        for path in new:
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, path)))
+
+    def test_card_uses_srcset_without_image_work(self):
+        """Карточка выводит srcset, не открывая картинки и хранилище."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.upload())
+        with mock.patch.object(thumbnails, 'render') as render, \
+                mock.patch('PIL.Image.open') as image_open:
+            response = self.client.get(reverse('index'))
+        render.assert_not_called()
+        image_open.assert_not_called()
+        post.refresh_from_db()
+        self.assertContains(response, post.srcset_webp)
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_unchanged_image_is_not_regenerated(self):
+        """Правка текста без новой картинки не запускает нарезку."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.upload())
+        post.refresh_from_db()
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            post.text = 'Новый текст'
+            post.save()
+        generate.assert_not_called()
+
+    @override_settings(JOBS_EAGER=False)
+    def test_async_mode_defers_work(self):
+        """С воркером запрос не режет картинку сам, а ставит задачу."""
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            self.client.post(reverse('new_post'),
+                             data={'text': 'Асинхронно',
+                                   'image': self.upload()})
+        generate.assert_not_called()
+        post = Post.objects.get(text='Асинхронно')
+        self.assertEqual(post.thumbnail_manifest, {})
+        self.assertTrue(Job.objects.filter(name='thumbnails.generate',
+                                           args=f'[{post.pk}]').exists())
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает её."""
+        self.client.get(reverse('profile_follow', args=[self.author.username]))
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        self.assertEqual(list(entries.values_list('post', flat=True)),
+                         [self.old_post.id])
+        self.client.get(reverse('profile_unfollow', args=[self.author.username]))
+        self.assertFalse(entries.exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post, pub_date=post.pub_date).exists())
+        response = self.client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']),
+                         [post, self.old_post])
+
+    def test_feed_page_is_one_query(self):
+        """Страница ленты читается из TimelineEntry одним запросом."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(1):
+            sources = timeline.feed_sources(self.reader)
+            page = list(sources[0][:10])
+        self.assertEqual(len(sources), 2)
+        self.assertEqual(page, [self.old_post])
+
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        limit = timeline.FANOUT_LIMIT
+        timeline.FANOUT_LIMIT = 1
+        try:
+            post = Post.objects.create(text='Популярный', author=self.author)
+        finally:
+            timeline.FANOUT_LIMIT = limit
+        post.refresh_from_db()
+        self.assertFalse(post.fanned_out)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        # Автор снова ниже порога, а пост остаётся в ленте.
+        response = self.client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']),
+                         [post, self.old_post])
+
+    def test_rebuild_keeps_unfanned_posts_out(self):
+        """rebuild() раскладывает только посты авторов ниже порога."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        limit = timeline.FANOUT_LIMIT
+        timeline.FANOUT_LIMIT = 1
+        try:
+            self.assertEqual(timeline.rebuild(), 0)
+        finally:
+            timeline.FANOUT_LIMIT = limit
+        self.assertFalse(Post.objects.filter(fanned_out=True).exists())
+        response = self.client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [self.old_post])
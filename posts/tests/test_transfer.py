@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from PIL import Image
+
+from posts import datagen, transfer
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.dump = os.path.join(self.tmp, 'blog.ndjson.gz')
+        self.media = os.path.join(self.tmp, 'media')
+        datagen.generate(60, seed=4)
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        Image.new('RGB', (40, 30), 'blue').save(
+            os.path.join(MEDIA_ROOT, 'posts', 'photo.png'))
+        Post.objects.filter(pk=Post.objects.first().pk).update(
+            image='posts/photo.png')
+
+    def snapshot(self):
+        return {model: list(model.objects.order_by('pk').values())
+                for model in (User, Group, Comment, Follow)}
+
+    def wipe(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        os.remove(os.path.join(MEDIA_ROOT, 'posts', 'photo.png'))
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка возвращают те же строки, картинки и ленты."""
+        before = self.snapshot()
+        posts = list(Post.objects.order_by('pk').values(
+            'id', 'text', 'pub_date', 'author', 'group', 'image',
+            'comment_count'))
+        timeline = TimelineEntry.objects.count()
+        written = transfer.export(self.dump, media=self.media)
+        self.assertEqual(written['posts.post'], 60)
+        with gzip.open(self.dump, 'rt') as file:
+            self.assertEqual(json.loads(next(file))['format'], transfer.FORMAT)
+
+        self.wipe()
+        transfer.load(self.dump, media=self.media)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(list(Post.objects.order_by('pk').values(
+            'id', 'text', 'pub_date', 'author', 'group', 'image',
+            'comment_count')), posts)
+        self.assertEqual(TimelineEntry.objects.count(), timeline)
+        self.assertTrue(
+            os.path.exists(os.path.join(MEDIA_ROOT, 'posts', 'photo.png')))
+        self.assertFalse(os.path.exists(self.dump + '.checkpoint'))
+
+    def test_images_are_stored_by_hash(self):
+        """Картинка лежит в каталоге media один раз, под хэшем содержимого."""
+        transfer.export(self.dump, media=self.media)
+        transfer.export(self.dump, media=self.media)
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'photo.png'), 'rb') as f:
+            digest = transfer.file_hash(f)
+        self.assertEqual(os.listdir(self.media), [f'{digest}.png'])
+
+    def test_interrupted_load_resumes_from_checkpoint(self):
+        """После сбоя загрузка продолжается с последней сохранённой пачки."""
+        before = self.snapshot()
+        transfer.export(self.dump)
+        self.wipe()
+        save = transfer._save
+        calls = []
+
+        def failing_save(model, batch):
+            calls.append(len(batch))
+            if len(calls) == 3:
+                raise RuntimeError('обрыв')
+            save(model, batch)
+
+        with mock.patch.object(transfer, 'BATCH_SIZE', 20), \
+                mock.patch.object(transfer, '_save', failing_save):
+            with self.assertRaises(RuntimeError):
+                transfer.load(self.dump)
+        self.assertEqual(transfer.read_checkpoint(self.dump + '.checkpoint'),
+                         sum(calls[:2]))
+
+        with mock.patch.object(transfer, '_save', wraps=save) as resumed:
+            transfer.load(self.dump)
+        self.assertEqual(sum(len(call.args[1])
+                             for call in resumed.call_args_list),
+                         sum(len(rows) for rows in before.values()) + 60
+                         - sum(calls[:2]))
+        self.assertEqual(self.snapshot(), before)
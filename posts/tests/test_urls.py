@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
+from django.test.utils import override_settings
 from django.urls import reverse
 
 from posts.models import Group, Post
 
 
+@override_settings(QUERY_BUDGET_STRICT=True)
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
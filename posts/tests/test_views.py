@@ -7,11 +7,13 @@ from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
+from django.test.utils import override_settings
 from django.urls import reverse
 
 from posts.models import Comment, Follow, Group, Post
 
 
+@override_settings(STREAM_PAGES=False, QUERY_BUDGET_STRICT=True)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -101,11 +103,12 @@ class PostPagesTests(TestCase):
         Пост для сообщества test-slug отображается на главной странице.
         Паджинатор для этой страницы работает согласно ожиданиям.
         """
-        response_1p = self.guest_client.get(reverse('index') + '?page=1')
+        response_1p = self.guest_client.get(reverse('index'))
         page = response_1p.context['page']
         self.assertEqual(len(page), 10)
         self.assertEqual(page[0].group.title, self.test_group.title)
-        response_2p = self.guest_client.get(reverse('index') + '?page=2')
+        response_2p = self.guest_client.get(
+            reverse('index') + '?after=' + page.next_cursor)
         self.assertEqual(len(response_2p.context['page']), 3)
 
     def test_page_group_shows_correct_context(self):
@@ -116,14 +119,16 @@ class PostPagesTests(TestCase):
         """
         rev_page = reverse('group', kwargs={'slug': 'test-slug'})
         reverse_empty_group = reverse('group', kwargs={'slug': 'empty'})
-        response_group_title = self.guest_client.get(rev_page + '?page=1')
+        response_group_title = self.guest_client.get(rev_page)
         self.assertEqual(response_group_title.context['group'],
                          self.test_group)
         response_empty_group = self.guest_client.get(reverse_empty_group)
         self.assertEqual(len(response_empty_group.context['page']), 0)
-        response_paginator_1p = self.guest_client.get(rev_page + '?page=1')
-        self.assertEqual(len(response_paginator_1p.context['page']), 10)
-        response_paginator_2p = self.guest_client.get(rev_page + '?page=2')
+        response_paginator_1p = self.guest_client.get(rev_page)
+        page = response_paginator_1p.context['page']
+        self.assertEqual(len(page), 10)
+        response_paginator_2p = self.guest_client.get(
+            rev_page + '?after=' + page.next_cursor)
         posts = self.guest_client.get(rev_page).context['group'].posts.all()
         self.assertIn(self.test_post, posts)
         self.assertEqual(len(response_paginator_2p.context['page']), 3)
@@ -156,11 +161,13 @@ class PostPagesTests(TestCase):
         """
         username = self.user.username
         reverse_name = reverse('profile', kwargs={'username': username})
-        response_1p = self.guest_client.get(reverse_name + '?page=1')
+        response_1p = self.guest_client.get(reverse_name)
         context_1p = response_1p.context
         self.assertEqual(len(context_1p['page']), 10)
         self.assertEqual(context_1p['page'][0].author.username, username)
-        response_2p = self.guest_client.get(reverse_name + '?page=2')
+        self.assertEqual(context_1p['post_count'], 12)
+        next_cursor = context_1p['page'].next_cursor
+        response_2p = self.guest_client.get(reverse_name + '?after=' + next_cursor)
         self.assertEqual(len(response_2p.context['page']), 2)
 
     def test_page_post_shows_correct_context(self):
@@ -199,14 +206,20 @@ class PostPagesTests(TestCase):
         self.assertEqual(response_404.context['path'], expected_context_404)
 
     def test_index_page_cache(self):
-        """Кэш главной страницы работает корректно"""
+        """Кэш карточек главной страницы работает корректно:
+           новый пост виден сразу, а готовые карточки берутся из кэша.
+        """
         response_1 = self.guest_client.get(reverse('index'))
-        Post.objects.create(text='test_cache', author=self.user)
+        post = Post.objects.create(text='test_cache', author=self.user)
         response_2 = self.guest_client.get(reverse('index'))
-        self.assertHTMLEqual(str(response_1.content), str(response_2.content))
-        cache.clear()
+        self.assertHTMLNotEqual(str(response_1.content), str(response_2.content))
+        self.assertContains(response_2, 'test_cache')
+        Post.objects.filter(pk=post.pk).update(text='test_cache_changed')
         response_3 = self.guest_client.get(reverse('index'))
-        self.assertHTMLNotEqual(str(response_1.content), str(response_3.content))
+        self.assertHTMLEqual(str(response_2.content), str(response_3.content))
+        cache.clear()
+        response_4 = self.guest_client.get(reverse('index'))
+        self.assertContains(response_4, 'test_cache_changed')
 
     def test_follow_unfollow(self):
         """Авторизованный пользователь может подписываться на других
@@ -0,0 +1,83 @@
+"""
+Превью картинок постов, подготовленные заранее.
+
+После сохранения поста с новой картинкой её нарезка уходит в очередь
+задач (thumbnails.generate в tasks.py): запрос на загрузку не ждёт
+Pillow. Для каждой ширины из THUMBNAIL_WIDTHS пишутся JPEG и WebP, а
+список файлов сохраняется в Post.thumbnails, откуда шаблон строит
+srcset без обращения к картинкам. В имени превью -- хэш его байтов:
+повторная нарезка с другими настройками даёт новые имена, поэтому
+превью кэшируются навсегда (blogging/media.py), а файлы прошлой нарезки
+удаляются.
+"""
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Post
+
+WIDTHS = getattr(settings, 'THUMBNAIL_WIDTHS', (480, 960, 1440))
+RATIO = 339 / 960
+FORMATS = {'jpeg': ('JPEG', 'jpg'), 'webp': ('WEBP', 'webp')}
+QUALITY = 82
+
+
+def needs_thumbnails(post):
+    if not post.image:
+        return False
+    return post.thumbnail_manifest.get('source') != post.image.name
+
+
+def render(image, width, fmt):
+    height = round(width * RATIO)
+    image = ImageOps.fit(image, (width, height), Image.LANCZOS,
+                         centering=(0.5, 0.5))
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=QUALITY)
+    return buffer.getvalue()
+
+
+def generate(post_id):
+    post = Post.objects.filter(pk=post_id).only('image', 'thumbnails').first()
+    if post is None or not post.image:
+        return None
+    if not default_storage.exists(post.image.name):
+        # Пост загружен из дампа без каталога media: резать нечего, а
+        # повтор задачи файл не вернёт.
+        return None
+    source = post.image.name
+    with post.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    base = os.path.splitext(source)[0]
+    manifest = {'source': source}
+    for name, (fmt, extension) in FORMATS.items():
+        manifest[name] = []
+        for width in WIDTHS:
+            data = render(image, width, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:20]
+            path = f'thumbnails/{base}-{width}-{digest}.{extension}'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(data))
+            manifest[name].append([width, path])
+    updated = Post.objects.filter(pk=post_id, image=source).update(
+        thumbnails=json.dumps(manifest), updated=timezone.now())
+    if updated:
+        _delete_stale(post.thumbnail_manifest, manifest)
+    return manifest
+
+
+def _delete_stale(old, new):
+    keep = {path for fmt in FORMATS for _, path in new.get(fmt, ())}
+    for fmt in FORMATS:
+        for _, path in old.get(fmt, ()):
+            if path not in keep:
+                default_storage.delete(path)
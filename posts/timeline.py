@@ -0,0 +1,96 @@
+"""
+Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков при записи (fan-out on
+write), поэтому чтение страницы ленты -- один проход по индексу
+TimelineEntry(user, pub_date, post). Посты популярных авторов, у которых
+подписчиков не меньше TIMELINE_FANOUT_LIMIT, не раскладываются, а
+подмешиваются при чтении (fan-out on read), чтобы не устраивать шторм
+записей.
+
+Способ раскладки решается один раз, при публикации, и запоминается в
+самом посте (Post.fanned_out). Когда число подписчиков автора пересекает
+порог в любую сторону, его старые посты остаются в лентах тем же путём,
+каким туда попали. Не разложенные посты ищутся тем же запросом страницы
+через подписки -- без отдельного запроса за популярными авторами.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 1000)
+BATCH_SIZE = 500
+FEED_ORDERING = ('-feed_pub_date', '-feed_post_id')
+
+
+def is_popular(author_id):
+    return UserCounters.objects.filter(
+        user=author_id, follower_count__gte=FANOUT_LIMIT).exists()
+
+
+def fan_out(post):
+    if is_popular(post.author_id):
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        return
+    followers = Follow.objects.filter(author=post.author_id).values_list(
+        'user_id', flat=True)
+    entries = (TimelineEntry(user_id=user_id, post=post,
+                             pub_date=post.pub_date)
+               for user_id in followers.iterator())
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(author=author_id, fanned_out=True).values_list(
+        'id', 'pub_date')
+    entries = [TimelineEntry(user_id=user_id, post_id=post_id,
+                             pub_date=pub_date)
+               for post_id, pub_date in posts[:BACKFILL_SIZE]]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user=user_id, post__author=author_id).delete()
+
+
+def feed_sources(user):
+    """Querysets для CursorPaginator с ordering=FEED_ORDERING."""
+    posts = Post.objects.select_related('author', 'group')
+    return [
+        posts.filter(timeline_entries__user=user).annotate(
+            feed_pub_date=F('timeline_entries__pub_date'),
+            feed_post_id=F('timeline_entries__post_id'),
+        ),
+        posts.filter(fanned_out=False, author__following__user=user).annotate(
+            feed_pub_date=F('pub_date'),
+            feed_post_id=F('id'),
+        ),
+    ]
+
+
+def rebuild():
+    """
+    Заново раскладывает все ленты одним INSERT ... SELECT, без
+    ограничения BACKFILL_SIZE. Нужна после массовой загрузки, когда
+    сигналы не срабатывали.
+    """
+    TimelineEntry.objects.all().delete()
+    Post.objects.update(fanned_out=True)
+    Post.objects.filter(
+        author__counters__follower_count__gte=FANOUT_LIMIT
+    ).update(fanned_out=False)
+    entries = TimelineEntry._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entries} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follows} f '
+            f'JOIN {posts} p ON p.author_id = f.author_id '
+            f'WHERE p.fanned_out = %s', [True])
+        return cursor.rowcount
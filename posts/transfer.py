@@ -0,0 +1,292 @@
+"""
+Выгрузка и загрузка блога потоком NDJSON.
+
+dumpdata собирает всю базу в памяти, а loaddata сохраняет объекты по
+одному. Здесь каждая строка файла -- одна запись {"model": ..., поля},
+модели идут в порядке зависимостей (пользователи, сообщества, посты,
+комментарии, подписки). Выгрузка читает таблицы iterator() кусками,
+загрузка пишет bulk_create пачками по BATCH_SIZE, так что память не
+зависит от размера блога. Файл с суффиксом .gz сжимается и читается
+через gzip тем же потоком.
+
+Загрузка идёт пачками, каждая в своей транзакции, а номер последней
+сохранённой строки пишется в файл <дамп>.checkpoint. Прерванную загрузку
+можно запустить заново: уже загруженные строки пропускаются, а
+повторная вставка тех же pk ничего не ломает (ignore_conflicts).
+Проверка внешних ключей на время загрузки отключается (как в loaddata)
+и выполняется один раз в конце. С defer_indexes вторичные индексы
+постов и комментариев снимаются до загрузки и строятся после: один
+проход по готовой таблице дешевле, чем обновлять индекс на каждой
+вставке.
+
+Производные данные не переносятся, а пересчитываются в конце:
+счётчики, ленты подписок, поисковый индекс (по желанию) и превью
+картинок (задачами в очереди). Сами картинки из MEDIA_ROOT/posts/
+копируются в каталог media под именем sha256 содержимого: одинаковые
+файлы лежат там один раз, и повторная выгрузка в тот же каталог
+копирует только новые.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, timeline
+from .conditional import touch
+from .datagen import manual_dates
+from .jobs import enqueue_many
+from .models import Comment, Follow, Group, Post, User
+
+MODELS = (User, Group, Post, Comment, Follow)
+# Пересчитываются после загрузки, в дамп не попадают.
+DERIVED = {Post: ('comment_count', 'thumbnails')}
+DEFERRED_INDEXES = (Post, Comment)
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+FORMAT = 'blog-ndjson'
+VERSION = 1
+
+
+class Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder обрезает время до миллисекунд.
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _fields(model):
+    skip = DERIVED.get(model, ())
+    return [field for field in model._meta.concrete_fields
+            if field.name not in skip]
+
+
+def file_hash(file):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _media_name(digest, name):
+    return digest + os.path.splitext(name)[1].lower()
+
+
+def _export_image(name, media):
+    """Копирует картинку в media под её хэшем, возвращает хэш."""
+    with default_storage.open(name, 'rb') as file:
+        digest = file_hash(file)
+        target = os.path.join(media, _media_name(digest, name))
+        if not os.path.exists(target):
+            file.seek(0)
+            with open(target + '.part', 'wb') as out:
+                shutil.copyfileobj(file, out, CHUNK_SIZE)
+            os.replace(target + '.part', target)
+    return digest
+
+
+def export(path, media=None, log=None):
+    """Пишет блог в path, возвращает {модель: число записей}."""
+    log = log or (lambda message: None)
+    if media:
+        os.makedirs(media, exist_ok=True)
+    written = {}
+    with _open(path, 'w') as out:
+        out.write(json.dumps({'format': FORMAT, 'version': VERSION}) + '\n')
+        for model in MODELS:
+            label = _label(model)
+            log(f'Выгрузка {label}')
+            names = [field.attname for field in _fields(model)]
+            rows = model.objects.order_by('pk').values(*names)
+            count = 0
+            for row in rows.iterator(chunk_size=BATCH_SIZE):
+                if media and model is Post and row['image']:
+                    if default_storage.exists(row['image']):
+                        row['image_sha256'] = _export_image(row['image'],
+                                                            media)
+                out.write(json.dumps({'model': label, **row}, cls=Encoder,
+                                     ensure_ascii=False) + '\n')
+                count += 1
+            written[label] = count
+    return written
+
+
+class Loader:
+    """Превращает записи дампа в несохранённые объекты моделей."""
+
+    def __init__(self, media=None):
+        self.media = media
+        self.models = {_label(model): model for model in MODELS}
+        self.converters = {
+            model: {field.attname: (parse_datetime
+                                    if isinstance(field, DateTimeField)
+                                    else None)
+                    for field in _fields(model)}
+            for model in MODELS
+        }
+
+    def instance(self, record):
+        model = self.models[record.pop('model')]
+        digest = record.pop('image_sha256', None)
+        values = {}
+        for name, convert in self.converters[model].items():
+            value = record.get(name)
+            values[name] = (convert(value) if convert and value is not None
+                            else value)
+        if digest and self.media:
+            self.restore_image(values['image'], digest)
+        return model(**values)
+
+    def restore_image(self, name, digest):
+        if default_storage.exists(name):
+            return
+        source = os.path.join(self.media, _media_name(digest, name))
+        if not os.path.exists(source):
+            raise FileNotFoundError(f'Нет картинки {source} для {name}')
+        with open(source, 'rb') as file:
+            saved = default_storage.save(name, File(file))
+        if saved != name:
+            raise ValueError(f'Картинка {name} сохранилась как {saved}')
+
+
+def _indexes(model):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table)
+    return {name for name, info in constraints.items() if info['index']}
+
+
+def drop_indexes():
+    with connection.schema_editor() as editor:
+        for model in DEFERRED_INDEXES:
+            existing = _indexes(model)
+            for index in model._meta.indexes:
+                if index.name in existing:
+                    editor.remove_index(model, index)
+
+
+def create_indexes():
+    with connection.schema_editor() as editor:
+        for model in DEFERRED_INDEXES:
+            existing = _indexes(model)
+            for index in model._meta.indexes:
+                if index.name not in existing:
+                    editor.add_index(model, index)
+
+
+def _save(model, batch):
+    with transaction.atomic():
+        if model is Post:
+            Post.objects.bulk_create(batch, ignore_conflicts=True,
+                                     count=False)
+            enqueue_many([('thumbnails.generate', (post.pk,),
+                           f'thumbnails:{post.pk}:{post.image.name}')
+                          for post in batch if post.image])
+        else:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _records(lines, checkpoint):
+    header = json.loads(next(lines))
+    if header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise ValueError(f'Неизвестный формат дампа: {header}')
+    for number, line in enumerate(lines, 1):
+        if number > checkpoint:
+            yield number, json.loads(line)
+
+
+def _batches(records, loader):
+    """Пачки (модель, объекты, номер последней строки) одной модели."""
+    model, batch, last = None, [], 0
+    for number, record in records:
+        obj = loader.instance(record)
+        if batch and (type(obj) is not model or len(batch) == BATCH_SIZE):
+            yield model, batch, last
+            batch = []
+        model = type(obj)
+        batch.append(obj)
+        last = number
+    if batch:
+        yield model, batch, last
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return int(file.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, line):
+    with open(path + '.part', 'w') as file:
+        file.write(str(line))
+    os.replace(path + '.part', path)
+
+
+def load(path, media=None, defer_indexes=False, index=False, restart=False,
+         log=None):
+    """Загружает дамп из path, возвращает {модель: число записей}."""
+    log = log or (lambda message: None)
+    checkpoint_path = path + '.checkpoint'
+    checkpoint = 0 if restart else read_checkpoint(checkpoint_path)
+    if checkpoint:
+        log(f'Продолжаю со строки {checkpoint + 1}')
+    if defer_indexes:
+        drop_indexes()
+    loaded = {}
+    loader = Loader(media)
+    with _open(path, 'r') as lines, manual_dates(), \
+            connection.constraint_checks_disabled():
+        for model, batch, last in _batches(_records(lines, checkpoint),
+                                           loader):
+            _save(model, batch)
+            write_checkpoint(checkpoint_path, last)
+            label = _label(model)
+            loaded[label] = loaded.get(label, 0) + len(batch)
+            log(f'{label}: {loaded[label]}')
+    connection.check_constraints(
+        table_names=[model._meta.db_table for model in MODELS])
+    if defer_indexes:
+        log('Индексы')
+        create_indexes()
+    _reset_sequences()
+    log('Счётчики и ленты')
+    counters.rebuild()
+    timeline.rebuild()
+    if index:
+        log('Поисковый индекс')
+        search.reindex()
+    touch('posts')
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return loaded
+
+
+def _reset_sequences():
+    # Записи пришли с готовыми pk: следующий INSERT не должен их повторить.
+    statements = connection.ops.sequence_reset_sql(no_style(), MODELS)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -1,14 +1,21 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from . import views
+from .feeds import FeedFormatConverter
+
+register_converter(FeedFormatConverter, 'feed')
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("404/", views.page_not_found, name="404"),
     path("500/", views.server_error, name="500"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
+    path("feeds/<feed:fmt>/", views.feed, name="feed"),
+    path("group/<slug:slug>/feeds/<feed:fmt>/", views.group_feed,
+         name="group_feed"),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
     path("<str:username>/follow/", views.profile_follow, name="profile_follow"),
     path(
         "<str:username>/unfollow/",
@@ -16,7 +23,14 @@ urlpatterns = [
         name="profile_unfollow"
     ),
     path("<str:username>/", views.profile, name="profile"),
+    path("<str:username>/feeds/<feed:fmt>/", views.profile_feed,
+         name="profile_feed"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
+    path(
+        "<str:username>/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
     path(
         "<str:username>/<int:post_id>/edit/",
         views.post_edit,
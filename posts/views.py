@@ -1,35 +1,56 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 
+from . import follows
+from . import search as search_index
+from . import suggestions, timeline
+from .conditional import (conditional, feed_validators, follow_validators,
+                          group_validators, index_validators,
+                          post_validators, profile_validators)
+from .counters import user_counters
+from .feeds import feed_response
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, SearchDocument, User
+from .paginator import COMMENT_ORDERING, COMMENTS_PER_PAGE, get_page
+from .streaming import render_posts
 
 
+@conditional(index_validators)
 def index(request):
-    post_list = Post.objects.select_related('group', 'author').prefetch_related('comments')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-         request,
-         'index.html',
-         {'page': page, 'paginator': paginator}
-    )
+    post_list = Post.objects.select_related('group', 'author')
+    return render_posts(request, 'index.html', {}, post_list)
 
 
+@conditional(group_validators)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author').prefetch_related('comments').all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-         request,
-         "group.html",
-         {"group": group, "page": page, "paginator": paginator}
-    )
+    post_list = group.posts.select_related('author').all()
+    return render_posts(request, "group.html", {"group": group}, post_list)
+
+
+@conditional(feed_validators, needs_stamps=False)
+def feed(request, fmt):
+    return feed_response(request, fmt, 'Blogging', 'Последние обновления',
+                         reverse('index'), Post.objects.all())
+
+
+@conditional(feed_validators, needs_stamps=False)
+def group_feed(request, slug, fmt):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, fmt, group.title, group.description,
+                         reverse('group', args=[slug]), group.posts.all())
+
+
+@conditional(feed_validators, needs_stamps=False)
+def profile_feed(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, fmt, f'Записи {author.username}',
+                         author.get_full_name() or author.username,
+                         reverse('profile', args=[username]),
+                         author.posts.all())
 
 
 @login_required
@@ -43,34 +64,45 @@ def new_post(request):
     return render(request, 'new_post.html', {'form': form, 'is_edit': False})
 
 
+@conditional(profile_validators)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group').prefetch_related('comments').all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = False
-    if request.user.is_authenticated:
-        following = request.user.follower.filter(author=author).exists()
-    context = {"page": page, "author": author,
-               "paginator": paginator, 'following': following}
-    return render(request, 'profile.html', context)
-
-
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    post_list = author.posts.select_related('group').all()
+    post_count = user_counters(author).post_count
+    context = {"author": author, "post_count": post_count,
+               'following': follows.is_following(request.user, author.pk),
+               'suggestions': suggestions.for_user(request.user,
+                                                   exclude=[author.pk])}
+    return render_posts(request, 'profile.html', context, post_list)
+
+
+@conditional(post_validators)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post.objects.select_related('author'), id=post_id, author__username=username)
-    post_list = post.author.posts.all()
-    post_count = post_list.count()
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(Post.objects.select_related('author__counters'),
+                             id=post_id, author__username=username)
+    post_count = user_counters(post.author).post_count
+    comments = get_page(request, post.comments.select_related('author'),
+                        per_page=COMMENTS_PER_PAGE, ordering=COMMENT_ORDERING)
     form = CommentForm(request.POST or None)
-    following = False
-    if request.user.is_authenticated:
-        following = request.user.follower.filter(author=post.author).exists()
     context = {'post': post, 'post_count': post_count, 'author': post.author,
-               'comments': comments, 'form': form, 'following': following}
+               'comments': comments, 'form': form,
+               'following': follows.is_following(request.user,
+                                                 post.author_id)}
     return render(request, 'post.html', context)
 
 
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев: HTML-фрагмент и курсор в JSON."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id,
+                             author__username=username)
+    comments = get_page(request, post.comments.select_related('author'),
+                        per_page=COMMENTS_PER_PAGE, ordering=COMMENT_ORDERING)
+    html = render_to_string('include/comment_list.html',
+                            {'comments': comments}, request)
+    return JsonResponse({'html': html, 'next': comments.next_cursor})
+
+
 @login_required
 def post_edit(request, username, post_id):
     if username != request.user.username:
@@ -114,26 +146,18 @@ def add_comment(request, username, post_id):
 
 
 @login_required
+@conditional(follow_validators)
 def follow_index(request):
-    post_list = Post.objects.select_related('group').filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-         request,
-         'follow.html',
-         {'page': page, 'paginator': paginator, }
-    )
+    return render_posts(request, 'follow.html', {},
+                        timeline.feed_sources(request.user),
+                        ordering=timeline.FEED_ORDERING)
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    if author != user and not user.follower.filter(author=author).exists():
-        Follow.objects.create(user=user, author=author)
-        return redirect(request.META.get('HTTP_REFERER',
-                        reverse('profile', args=[username])))
+    if author != request.user:
+        follows.follow(request.user.pk, author.pk)
     return redirect(request.META.get('HTTP_REFERER',
                     reverse('profile', args=[username])))
 
@@ -144,3 +168,21 @@ def profile_unfollow(request, username):
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect(request.META.get('HTTP_REFERER',
                     reverse('profile', args=[username])))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    # Число документов для idf переходит со страницы на страницу (n).
+    documents = request.GET.get('n', '')
+    documents = int(documents) if documents.isdigit() else None
+    if query:
+        if documents is None:
+            documents = SearchDocument.objects.count()
+        results, stems = search_index.search(query, documents)
+        page = get_page(request, results,
+                        ordering=search_index.SEARCH_ORDERING)
+        for document in page:
+            document.snippet = search_index.highlight(document.text, stems)
+    return render(request, 'search.html', {'query': query, 'page': page,
+                                           'documents': documents})
@@ -1,11 +1,39 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.urls import get_resolver
 
 
 User = get_user_model()
 
 
+def _prefixes(patterns):
+    for pattern in patterns:
+        head = str(pattern.pattern).lstrip("^").split("/")[0]
+        if not head and hasattr(pattern, "url_patterns"):
+            yield from _prefixes(pattern.url_patterns)
+        elif head.replace("_", "").isalnum():
+            yield head
+
+
+def reserved_usernames():
+    """Первые сегменты адресов сайта: search, feeds, group, auth, media...
+
+    Профиль живёт по адресу /<username>/, так что пользователь с таким
+    именем делил бы адреса с разделом сайта.
+    """
+    return set(_prefixes(get_resolver().url_patterns))
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if username.lower() in reserved_usernames():
+            raise forms.ValidationError(
+                "Это имя занято адресом сайта, выберите другое.",
+                code="reserved")
+        return username
@@ -1,3 +1,30 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .forms import CreationForm
+
+
+class CreationFormTests(TestCase):
+    def form(self, username):
+        return CreationForm({'username': username,
+                             'password1': 'Kv9!pq-slon-42',
+                             'password2': 'Kv9!pq-slon-42'})
+
+    def test_route_names_are_reserved(self):
+        """Имя, чей профиль перекрыт маршрутом сайта, не регистрируется."""
+        for username in ('search', 'feeds', 'Feeds', 'follow', 'new',
+                         'group', 'media', 'auth'):
+            with self.subTest(username=username):
+                form = self.form(username)
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors.as_data()['username'][0].code,
+                                 'reserved')
+        self.assertTrue(self.form('searcher').is_valid())
+
+    def test_signup_rejects_reserved_name(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'search', 'password1': 'Kv9!pq-slon-42',
+            'password2': 'Kv9!pq-slon-42'})
+        self.assertFormError(response, 'form', 'username',
+                             'Это имя занято адресом сайта, выберите другое.')
+        self.assertFalse(CreationForm._meta.model.objects.exists())